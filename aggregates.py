@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import OrderedDict
+
+from ledger import follows, normalize_donor
+from schedule import pledged_amount
+
+# Process-wide cache of dashboard aggregates (per donor and per organization),
+# shared by every session. Entries are loaded from the ledger on
+# first use, evicted least-recently-used beyond `maxsize` or after `ttl`
+# seconds, and invalidated explicitly whenever a donation is recorded.
+#
+# A key being loaded carries a generation number that invalidate() bumps, so a
+# load that raced with a new donation is discarded instead of caching a stale
+# total. Generations are only kept while a load is in flight.
+# sync() invalidates for every donation recorded since the last call, by any
+# worker process, so totals agree across processes sharing the ledger.
+#
+# Event totals are not cached here: DonationFeed (events.py) keeps the running
+# total for the event it follows, updated once per published batch.
+
+DEFAULT_MAXSIZE = 10_000
+DEFAULT_TTL = 300
+
+
+class AggregateCache:
+    def __init__(self, ledger, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL):
+        self.ledger = ledger
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # cache_key -> [generation, loads in flight]
+        self._loading = {}
+        self._sync_lock = threading.Lock()
+        self._watermark = ledger.last_id()
+        self._loaders = {
+            "donor": self._load_donor,
+            "organization": self.ledger.org_summary,
+        }
+
+    def _load_donor(self, donor):
+        summary = self.ledger.donor_summary(donor) or {
+            "donor_name": "", "total": 0, "donation_count": 0, "max_amount": 0,
+        }
+        summary["pledged"] = sum(
+            pledged_amount(amount, frequency)
+            for frequency, amount in self.ledger.donor_amounts_by_frequency(donor).items()
+        )
+        return summary
+
+    def get(self, kind, key):
+        cache_key = (kind, key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(cache_key)
+                return entry[1]
+            loading = self._loading.setdefault(cache_key, [0, 0])
+            loading[1] += 1
+            generation = loading[0]
+
+        try:
+            value = self._loaders[kind](key)
+        except BaseException:
+            with self._lock:
+                self._finish_load(cache_key)
+            raise
+
+        with self._lock:
+            if self._finish_load(cache_key) == generation:
+                self._entries[cache_key] = (now + self.ttl, value)
+                self._entries.move_to_end(cache_key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return value
+
+    def _finish_load(self, cache_key):
+        # Called with the lock held; returns the key's current generation.
+        loading = self._loading[cache_key]
+        loading[1] -= 1
+        if not loading[1]:
+            del self._loading[cache_key]
+        return loading[0]
+
+    def donor(self, donor):
+        return self.get("donor", normalize_donor(donor))
+
+    def organization(self, organization):
+        return self.get("organization", organization)
+
+    def invalidate(self, kind, key):
+        cache_key = (kind, key)
+        with self._lock:
+            self._entries.pop(cache_key, None)
+            loading = self._loading.get(cache_key)
+            if loading is not None:
+                loading[0] += 1
+
+    def record(self, donation):
+        # Drop every aggregate a new donation changes.
+        self.invalidate("donor", normalize_donor(donation["donor"]))
+        for organization in donation["organizations"]:
+            self.invalidate("organization", organization)
+
+    def sync(self):
+        while True:
+            donations = self.ledger.donations_after(self._watermark)
+            if not donations:
+                return
+            self._apply(donations)
+
+    def apply(self, donations):
+        # Invalidate for ledger donations (id order) not yet seen. A batch
+        # that skips past the watermark (donations published before this cache
+        # subscribed) is replaced by catching up from the ledger.
+        if not follows(self._watermark, donations):
+            self.sync()
+            return
+        self._apply(donations)
+
+    def _apply(self, donations):
+        with self._sync_lock:
+            for donation in donations:
+                if donation["id"] > self._watermark:
+                    self.record(donation)
+                    self._watermark = donation["id"]
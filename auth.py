@@ -0,0 +1,212 @@
+import hashlib
+import importlib
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from ledger import DEFAULT_LEDGER_PATH, normalize_donor
+
+# Accounts, sign-in links and server-side sessions.
+# Signing in proves ownership of the email address: the login form only
+# requests a one-time link, which is emailed to the guest. Opening the link
+# (?login=<code>) redeems it once, before LOGIN_LINK_TTL seconds run out.
+# On a guest's first sign-in the details they entered on the form become
+# their account; an existing account's profile is never changed by a login.
+#
+# A redeemed link starts a session. The session token is a random value
+# kept in a browser cookie (SESSION_COOKIE), never in the page URL. Only a
+# SHA-256 hash of each token and each link code is stored, in the same
+# database file, so every worker process sees the same sessions. Logging out
+# revokes the session server-side; otherwise it expires after SESSION_TTL
+# seconds.
+
+SESSION_TTL = int(os.environ.get("DONATE_SESSION_TTL", 12 * 60 * 60))
+LOGIN_LINK_TTL = int(os.environ.get("DONATE_LOGIN_LINK_TTL", 15 * 60))
+SESSION_COOKIE = "donate_session"
+TOKEN_BYTES = 32
+# DONATE_MAILER value that selects the development outbox.
+OUTBOX_MAILER = "outbox"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    email TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    organization TEXT NOT NULL DEFAULT '',
+    giving_level TEXT NOT NULL DEFAULT '',
+    interests TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL,
+    last_login_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS login_links (
+    code_hash TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    name TEXT NOT NULL,
+    organization TEXT NOT NULL,
+    giving_level TEXT NOT NULL,
+    interests TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    used_at TEXT
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS sessions (
+    token_hash TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    revoked_at TEXT
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_login_links_expires ON login_links(expires_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at);
+"""
+
+INTEREST_SEPARATOR = ";"
+ACCOUNT_COLUMNS = "email, name, organization, giving_level, interests"
+
+
+def _hash(token):
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _account(row):
+    return {
+        "email": row[0],
+        "name": row[1],
+        "organization": row[2],
+        "giving_level": row[3],
+        "interests": row[4].split(INTEREST_SEPARATOR) if row[4] else [],
+    }
+
+
+class OutboxMailer:
+    # Development mailer: appends each message as a JSON line to
+    # DONATE_OUTBOX instead of sending it.
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get("DONATE_OUTBOX", "outbox.jsonl")
+        self._lock = threading.Lock()
+
+    def send(self, to, subject, body):
+        message = {"to": to, "subject": subject, "body": body, "sent_at": _now()}
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(message) + "\n")
+
+
+def mailer_from_env():
+    # DONATE_MAILER="package.module:ClassName" selects a real mailer (any
+    # object with send(to, subject, body)); DONATE_MAILER=outbox writes the
+    # messages to the development outbox. There is no default: sign-in links
+    # that never reach a guest would lock everyone out without a trace.
+    spec = os.environ.get("DONATE_MAILER")
+    if not spec:
+        raise RuntimeError(
+            "DONATE_MAILER is not set; name the mailer class as package.module:ClassName, "
+            f"or set it to '{OUTBOX_MAILER}' to write sign-in links to a local file in development"
+        )
+    if spec == OUTBOX_MAILER:
+        return OutboxMailer()
+    module_name, _, class_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class AuthService:
+    def __init__(self, path=DEFAULT_LEDGER_PATH, ttl=SESSION_TTL, link_ttl=LOGIN_LINK_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.link_ttl = link_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    # Sign-in links
+
+    def request_login(self, email, name, organization="", giving_level="", interests=()):
+        # Returns a one-time sign-in code for `email`, to be sent to that
+        # address. The profile fields are only used if the link creates the
+        # account.
+        code = secrets.token_urlsafe(TOKEN_BYTES)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO login_links (code_hash, email, name, organization, giving_level, interests, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    _hash(code), normalize_donor(email), name, organization, giving_level,
+                    INTEREST_SEPARATOR.join(interests), time.time() + self.link_ttl,
+                ),
+            )
+        return code
+
+    def complete_login(self, code):
+        # Redeems a sign-in code. Returns (account, session token), or None
+        # for an unknown, expired or already used code.
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                link = self._conn.execute(
+                    "UPDATE login_links SET used_at = ? "
+                    "WHERE code_hash = ? AND used_at IS NULL AND expires_at > ? "
+                    f"RETURNING {ACCOUNT_COLUMNS}",
+                    (_now(), _hash(code), now),
+                ).fetchone()
+                if link is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                # Registers the guest on first sign-in; later sign-ins keep
+                # the stored profile.
+                self._conn.execute(
+                    f"INSERT INTO accounts ({ACCOUNT_COLUMNS}, created_at, last_login_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (email) DO UPDATE SET last_login_at = excluded.last_login_at",
+                    (*link, _now(), _now()),
+                )
+                account = _account(self._conn.execute(
+                    f"SELECT {ACCOUNT_COLUMNS} FROM accounts WHERE email = ?", (link[0],)
+                ).fetchone())
+                token = secrets.token_urlsafe(TOKEN_BYTES)
+                self._conn.execute(
+                    "INSERT INTO sessions (token_hash, email, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                    (_hash(token), account["email"], _now(), now + self.ttl),
+                )
+                self._conn.execute("DELETE FROM login_links WHERE expires_at <= ?", (now,))
+                self._conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return account, token
+
+    # Sessions
+
+    def session_account(self, token):
+        # The account for a live (unexpired, not revoked) session, else None.
+        if not isinstance(token, str) or not token:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT a.email, a.name, a.organization, a.giving_level, a.interests "
+                "FROM sessions s JOIN accounts a ON a.email = s.email "
+                "WHERE s.token_hash = ? AND s.revoked_at IS NULL AND s.expires_at > ?",
+                (_hash(token), time.time()),
+            ).fetchone()
+        return None if row is None else _account(row)
+
+    def logout(self, token):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sessions SET revoked_at = ? WHERE token_hash = ? AND revoked_at IS NULL",
+                (_now(), _hash(token)),
+            )
+
+    def close(self):
+        self._conn.close()
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
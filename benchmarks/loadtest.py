@@ -0,0 +1,278 @@
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import Manager
+
+from rerun import find_button, sign_in, wait_for_payment
+
+# Load test for donate.py: simulated gala guests arriving over time.
+#
+# Each worker process stands in for one app instance (its own process-wide
+# caches, payment pipeline and live feed, all sharing one ledger file) and
+# drives its guests through Streamlit's AppTest, up to --sessions-per-instance
+# of them at once (their script runs take turns, as AppTest cannot overlap
+# them). Each session walks through:
+#   login      - first run, the login page
+#   dashboard  - login form submitted and the emailed sign-in link opened
+#   donation   - donation form submitted (payment queued)
+#   payment    - until the charge has settled and the page shows it
+#   receipt    - receipt prepared for download
+#   rsvp       - RSVP form submitted
+# Arrivals follow a Poisson process at users / duration; a guest who arrives
+# while all of their instance's session slots are busy waits, and that wait is
+# reported as lag, the sign that the instance is saturated. A finished session
+# stays open (its AppTest and session state kept alive) until its slot takes
+# the next guest, so every instance holds up to K live sessions; RSS growth
+# after warm-up divided by K is the memory cost of one session.
+#
+#   python benchmarks/loadtest.py --scenario smoke
+#   python benchmarks/loadtest.py --scenario gala-peak --processes 4 --time-scale 10 --sessions-per-instance 8
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(APP_DIR, "donate.py")
+STEPS = ("login", "dashboard", "donation", "payment", "receipt", "rsvp")
+# users arriving over duration seconds
+SCENARIOS = {
+    "gala-peak": {"users": 800, "duration": 600},
+    "smoke": {"users": 20, "duration": 30},
+}
+PERCENTILES = (50, 95, 99)
+# Seconds a worker waits for the others to finish warming up.
+BARRIER_TIMEOUT = 300
+# AppTest runs scripts against one process-wide mock runtime, so the open
+# sessions of an instance take turns, one script run at a time.
+_script_run_lock = threading.Lock()
+
+
+def guest_email(user):
+    return f"guest-{user}@example.org"
+
+
+def arrivals(users, duration, seed):
+    # (user, seconds after start) for a Poisson process with `users` expected
+    # arrivals in `duration` seconds, rescaled to end within the window.
+    rng = random.Random(seed)
+    times, t = [], 0.0
+    for _ in range(users):
+        t += rng.expovariate(users / duration)
+        times.append(t)
+    scale = min(1.0, duration / times[-1]) if times else 1.0
+    return [(user, t * scale) for user, t in enumerate(times)]
+
+
+def run_session(user):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    run = at.run
+
+    def locked_run(*args, **kwargs):
+        with _script_run_lock:
+            return run(*args, **kwargs)
+
+    at.run = locked_run
+
+    def login():
+        sign_in(at, f"Guest {user}", guest_email(user))
+        at.run()
+
+    def donate():
+        find_button(at, "Complete Donation").click()
+        at.run()
+
+    def receipt():
+        find_button(at, "Prepare Donation Receipt").click()
+        at.run()
+
+    def rsvp():
+        find_button(at, "RSVP Now").click()
+        at.run()
+
+    actions = {
+        "login": at.run,
+        "dashboard": login,
+        "donation": donate,
+        "payment": lambda: wait_for_payment(at, timeout=120),
+        "receipt": receipt,
+        "rsvp": rsvp,
+    }
+    steps = {}
+    for step in STEPS:
+        start = time.perf_counter()
+        actions[step]()
+        steps[step] = time.perf_counter() - start
+        if at.exception:
+            raise RuntimeError(f"{step}: {at.exception[0].message}")
+    return steps, at
+
+
+def _rss_kib():
+    # Peak resident set size of this process (KiB on Linux).
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_worker(job):
+    worker, schedule, ledger_path, barrier, slots = job
+    # The ledger path is read when ledger.py is first imported.
+    os.environ["DONATE_LEDGER_PATH"] = ledger_path
+    os.environ["DONATE_MAILER"] = "outbox"
+    os.environ["DONATE_OUTBOX"] = os.path.join(os.path.dirname(ledger_path), f"outbox-{worker}.jsonl")
+    sys.path.insert(0, APP_DIR)
+
+    # Warm imports and process-wide caches before the clock starts. A worker
+    # whose warm-up fails breaks the barrier so the others stop waiting.
+    try:
+        run_session(f"warmup-{worker}")
+    except BaseException:
+        barrier.abort()
+        raise
+    baseline_kib = _rss_kib()
+    barrier.wait(BARRIER_TIMEOUT)
+    t0 = time.perf_counter()
+
+    # The session each slot (pool thread) last ran stays open until the slot
+    # starts the next one.
+    open_sessions = threading.local()
+
+    def serve(user, offset):
+        started = time.perf_counter()
+        record = {"user": user, "worker": worker, "lag": started - (t0 + offset)}
+        open_sessions.at = None
+        try:
+            record["steps"], open_sessions.at = run_session(user)
+        except Exception as e:
+            record["error"] = str(e)
+        record["finished"] = time.perf_counter() - t0
+        record["duration"] = time.perf_counter() - started
+        return record
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=slots, thread_name_prefix="session") as pool:
+        for user, offset in schedule:
+            delay = t0 + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(serve, user, offset))
+        sessions = [future.result() for future in futures]
+        # Read while the pool's threads still hold their last sessions.
+        peak_kib = _rss_kib()
+    return {
+        "worker": worker, "baseline_kib": baseline_kib, "peak_kib": peak_kib,
+        "live_sessions": min(slots, len(schedule)), "sessions": sessions,
+    }
+
+
+def percentile(values, pct):
+    # Nearest-rank percentile.
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-pct * len(ordered) // 100))
+    return ordered[int(rank) - 1]
+
+
+def latency_summary(values):
+    summary = {f"p{pct}_ms": percentile(values, pct) * 1000 for pct in PERCENTILES} if values else {}
+    summary["max_ms"] = max(values) * 1000 if values else None
+    return summary
+
+
+def summarize(workers, users, duration, time_scale, processes, slots):
+    sessions = [s for w in workers for s in w["sessions"]]
+    completed = [s for s in sessions if "error" not in s]
+    wall = max((s["finished"] for s in sessions), default=0.0)
+    return {
+        "users": users,
+        "duration_s": duration,
+        "time_scale": time_scale,
+        "processes": processes,
+        "sessions_per_instance": slots,
+        "offered_per_min": users / (duration / time_scale) * 60,
+        "completed": len(completed),
+        "failed": len(sessions) - len(completed),
+        "errors": sorted({s["error"] for s in sessions if "error" in s})[:5],
+        "wall_s": wall,
+        "throughput_per_min": len(completed) / wall * 60 if wall else 0.0,
+        "steps": {step: latency_summary([s["steps"][step] for s in completed]) for step in STEPS},
+        "session": latency_summary([s["duration"] for s in completed]),
+        "lag": latency_summary([s["lag"] for s in sessions]),
+        # Per instance: its peak, how much it grew after warm-up, and that
+        # growth spread over the sessions it held open.
+        "memory": {
+            "peak_rss_mib": max(w["peak_kib"] for w in workers) / 1024,
+            "growth_mib": max(w["peak_kib"] - w["baseline_kib"] for w in workers) / 1024,
+            "per_session_mib": max(
+                (w["peak_kib"] - w["baseline_kib"]) / w["live_sessions"] for w in workers if w["live_sessions"]
+            ) / 1024 if any(w["live_sessions"] for w in workers) else None,
+        },
+    }
+
+
+def run(users, duration, time_scale=1.0, processes=None, seed=0, slots=1):
+    processes = processes or os.cpu_count()
+    schedule = arrivals(users, duration / time_scale, seed)
+    # Round-robin, as a load balancer without sticky sessions would.
+    shares = [schedule[i::processes] for i in range(processes)]
+
+    with tempfile.TemporaryDirectory() as tmp, Manager() as manager:
+        ledger_path = os.path.join(tmp, "donations.db")
+        barrier = manager.Barrier(processes)
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            jobs = [(worker, share, ledger_path, barrier, slots) for worker, share in enumerate(shares)]
+            workers = list(pool.map(run_worker, jobs))
+    return summarize(workers, users, duration, time_scale, processes, slots)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for donate.py")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="gala-peak")
+    parser.add_argument("--users", type=int, help="Override the scenario's user count")
+    parser.add_argument("--duration", type=float, help="Override the scenario's arrival window (seconds)")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Compress the arrival window by this factor (10 runs a 10-minute peak in 1 minute)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="App instances (worker processes)")
+    parser.add_argument("--sessions-per-instance", type=int, default=1,
+                        help="Sessions each instance serves at once (and keeps open)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    scenario = SCENARIOS[args.scenario]
+    users = args.users or scenario["users"]
+    duration = args.duration or scenario["duration"]
+    result = run(users, duration, args.time_scale, args.processes, args.seed, args.sessions_per_instance)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(
+        f"{result['users']:,} users over {result['duration_s'] / result['time_scale']:.0f}s "
+        f"({result['offered_per_min']:.0f}/min offered) on {result['processes']} process(es), "
+        f"{result['sessions_per_instance']} session(s) each"
+    )
+    print(
+        f"completed {result['completed']:,}, failed {result['failed']:,} in {result['wall_s']:.1f}s "
+        f"-> {result['throughput_per_min']:.0f} sessions/min"
+    )
+    for error in result["errors"]:
+        print(f"  error: {error}")
+    print(f"{'step':<10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, r in [*result["steps"].items(), ("session", result["session"]), ("lag", result["lag"])]:
+        if r.get("max_ms") is None:
+            continue
+        print(f"{name:<10} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['max_ms']:>9.1f}")
+    memory = result["memory"]
+    print(f"memory: peak RSS {memory['peak_rss_mib']:.0f} MiB per process, +{memory['growth_mib']:.0f} MiB after warm-up")
+    if memory["per_session_mib"] is not None:
+        print(f"        {memory['per_session_mib']:.1f} MiB per live session")
+
+
+if __name__ == "__main__":
+    main()
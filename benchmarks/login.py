@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from rerun import emailed_login_code, find_button
+
+# Login throughput benchmark.
+#
+#   auth     - AuthService request_login() + complete_login() +
+#              session_account() against a fresh database
+#   submit   - AppTest run of the login form submit (sign-in link stored and
+#              emailed to the development outbox), one session at a time
+#   link     - AppTest first run of a new page opening that link (link
+#              redeemed, account created, session started, dashboard rendered)
+#
+# Each app session runs on one script thread, so 1 / median (submit + link)
+# time is the logins per second a single Streamlit worker thread can sustain.
+# AppTest sends no cookies, so a reload's session lookup is covered by the
+# auth phase alone.
+#
+#   python benchmarks/login.py --sessions 50
+#   python benchmarks/login.py --json
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(APP_DIR, "donate.py")
+
+
+def bench_email(i):
+    return f"login-bench-{i}@example.org"
+
+
+def bench_auth(path, count):
+    from auth import AuthService
+
+    auth = AuthService(path)
+    start = time.perf_counter()
+    for i in range(count):
+        code = auth.request_login(bench_email(i), f"Guest {i}", interests=["Teacher Training"])
+        _, token = auth.complete_login(code)
+        if auth.session_account(token) is None:
+            raise RuntimeError("new session was not found")
+    elapsed = time.perf_counter() - start
+    auth.close()
+    return {"logins": count, "wall_s": elapsed, "logins_per_s": count / elapsed}
+
+
+def bench_app(sessions, offset):
+    from streamlit.testing.v1 import AppTest
+
+    submit_times, link_times = [], []
+    for i in range(offset, offset + sessions):
+        at = AppTest.from_file(APP_PATH, default_timeout=60).run()
+        at.text_input[0].input(f"Guest {i}")
+        at.text_input[1].input(bench_email(i))
+        find_button(at, "Request Access").click()
+        start = time.perf_counter()
+        at.run()
+        submit_times.append(time.perf_counter() - start)
+
+        if at.exception or not at.session_state["login_link_sent"]:
+            raise RuntimeError(f"login link was not sent: {at.exception}")
+
+        link = AppTest.from_file(APP_PATH, default_timeout=60)
+        link.query_params["login"] = emailed_login_code(bench_email(i))
+        start = time.perf_counter()
+        link.run()
+        link_times.append(time.perf_counter() - start)
+        if link.exception or not link.session_state["logged_in"]:
+            raise RuntimeError(f"sign-in link was not accepted: {link.exception}")
+
+    def summarize(times):
+        return {
+            "median_ms": statistics.median(times) * 1000,
+            "max_ms": max(times) * 1000,
+            "per_s": 1 / statistics.median(times),
+        }
+
+    return {"submit": summarize(submit_times), "link": summarize(link_times)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Login throughput benchmark for donate.py")
+    parser.add_argument("--sessions", type=int, default=20, help="App sessions to log in")
+    parser.add_argument("--accounts", type=int, default=5000, help="Logins against the auth layer alone")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The ledger path is read when ledger.py is first imported.
+        os.environ["DONATE_LEDGER_PATH"] = os.path.join(tmp, "donations.db")
+        os.environ["DONATE_MAILER"] = "outbox"
+        os.environ["DONATE_OUTBOX"] = os.path.join(tmp, "outbox.jsonl")
+        sys.path.insert(0, APP_DIR)
+
+        results = {"auth": bench_auth(os.path.join(tmp, "auth.db"), args.accounts)}
+        # Warm imports and process-wide caches before timing.
+        bench_app(1, offset=args.sessions)
+        results.update(bench_app(args.sessions, offset=0))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    auth = results["auth"]
+    print(f"auth layer: {auth['logins']:,} logins in {auth['wall_s']:.2f}s ({auth['logins_per_s']:,.0f} logins/s)")
+    print(f"{'phase':<8} {'median ms':>10} {'max ms':>10} {'per s':>8}")
+    for phase in ("submit", "link"):
+        r = results[phase]
+        print(f"{phase:<8} {r['median_ms']:>10.1f} {r['max_ms']:>10.1f} {r['per_s']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+# Headless rerun benchmark for donate.py.
+#
+# Drives one session through the app with Streamlit's AppTest:
+#   login     - first run of main(), the login page
+#   dashboard - login form submitted, then the emailed sign-in link opened
+#               and main_dashboard() rendered
+#   donation  - donation form submitted (payment queued)
+#   rsvp      - RSVP form submitted, once the queued payment has settled
+# for donors whose ledger history already holds 1, 100 and 10,000 donations,
+# and reports per-phase wall time, allocations and emitted element count.
+#
+#   python benchmarks/rerun.py --repeat 5
+#   python benchmarks/rerun.py --histories 1 100 --json
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(APP_DIR, "donate.py")
+DEFAULT_HISTORIES = (1, 100, 10_000)
+PHASES = ("login", "dashboard", "donation", "rsvp")
+
+
+def bench_email(history, session):
+    return f"bench-{history}-{session}@example.org"
+
+
+def seed_ledger(ledger, history, sessions):
+    # Each benchmark session logs in as its own donor, since RSVPs persist.
+    start = date(2024, 1, 1)
+    ledger.append_many(
+        {
+            "donor": bench_email(history, session),
+            "donor_name": f"Bench Donor {history}",
+            "date": (start + timedelta(days=i % 365)).isoformat(),
+            "amount": 5000 + (i % 20) * 500,
+            "organizations": ["Room to Read", "Malala Fund"],
+            "frequency": "One-time",
+        }
+        for session in range(sessions)
+        for i in range(history)
+    )
+
+
+def count_elements(node):
+    children = getattr(node, "children", None)
+    if not children:
+        return 1
+    return sum(count_elements(child) for child in children.values())
+
+
+def find_button(at, label):
+    for button in at.button:
+        if label in button.label:
+            return button
+    raise LookupError(f"no button labelled {label!r}")
+
+
+def emailed_login_code(email):
+    # The code from the latest sign-in link sent to `email` (development
+    # outbox, DONATE_OUTBOX).
+    with open(os.environ["DONATE_OUTBOX"], encoding="utf-8") as f:
+        messages = [json.loads(line) for line in f]
+    for message in reversed(messages):
+        if message["to"] == email:
+            return re.search(r"[?&]login=([\w-]+)", message["body"]).group(1)
+    raise LookupError(f"no sign-in link sent to {email}")
+
+
+def sign_in(at, name, email):
+    # Submits the login form (untimed); the next run opens the emailed link.
+    at.text_input[0].input(name)
+    at.text_input[1].input(email)
+    find_button(at, "Request Access").click()
+    at.run()
+    at.query_params["login"] = emailed_login_code(email)
+
+
+def wait_for_payment(at, timeout=30):
+    # The donation is charged in the background; rerun (untimed) until the
+    # session has picked up the outcome and the ticket section is rendered.
+    deadline = time.monotonic() + timeout
+    while at.session_state["pending_payment"]:
+        if time.monotonic() > deadline:
+            raise TimeoutError("payment did not settle")
+        time.sleep(0.05)
+        at.run()
+
+
+def session_steps(at, history, session):
+    def login():
+        sign_in(at, f"Bench Donor {history}", bench_email(history, session))
+
+    def donate():
+        find_button(at, "Complete Donation").click()
+
+    def rsvp():
+        wait_for_payment(at)
+        find_button(at, "RSVP Now").click()
+
+    return [("login", None), ("dashboard", login), ("donation", donate), ("rsvp", rsvp)]
+
+
+def run_session(history, session, trace):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    results = {}
+    for phase, action in session_steps(at, history, session):
+        if action is not None:
+            action()
+        if trace:
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        at.run()
+        elapsed = time.perf_counter() - start
+        if at.exception:
+            raise RuntimeError(f"{phase}: {at.exception}")
+        result = {"wall_s": elapsed, "elements": count_elements(at.main) + count_elements(at.sidebar)}
+        if trace:
+            after, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            result["allocated_bytes"] = after - before
+            result["peak_bytes"] = peak - before
+        results[phase] = result
+    return results
+
+
+def bench_history(history, repeat):
+    timed = [run_session(history, session, trace=False) for session in range(1, repeat + 1)]
+    traced = run_session(history, repeat + 1, trace=True)
+    summary = {}
+    for phase in PHASES:
+        times = [run[phase]["wall_s"] for run in timed]
+        summary[phase] = {
+            "median_ms": statistics.median(times) * 1000,
+            "max_ms": max(times) * 1000,
+            "allocated_kib": traced[phase]["allocated_bytes"] / 1024,
+            "peak_kib": traced[phase]["peak_bytes"] / 1024,
+            "elements": traced[phase]["elements"],
+        }
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless rerun benchmark for donate.py")
+    parser.add_argument("--histories", type=int, nargs="+", default=list(DEFAULT_HISTORIES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The ledger path is read when ledger.py is first imported.
+        os.environ["DONATE_LEDGER_PATH"] = os.path.join(tmp, "donations.db")
+        os.environ["DONATE_MAILER"] = "outbox"
+        os.environ["DONATE_OUTBOX"] = os.path.join(tmp, "outbox.jsonl")
+        sys.path.insert(0, APP_DIR)
+        from ledger import DonationLedger
+
+        ledger = DonationLedger()
+        for history in args.histories:
+            # Session 0 is the warm-up, then `repeat` timed and one traced.
+            seed_ledger(ledger, history, args.repeat + 2)
+        ledger.close()
+
+        # Warm imports and process-wide caches so the first history size
+        # isn't charged for them.
+        run_session(args.histories[0], 0, trace=False)
+        results = {history: bench_history(history, args.repeat) for history in args.histories}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'history':>8} {'phase':<10} {'median ms':>10} {'max ms':>10} {'alloc KiB':>10} {'peak KiB':>10} {'elements':>9}")
+    for history, phases in results.items():
+        for phase, r in phases.items():
+            print(
+                f"{history:>8} {phase:<10} {r['median_ms']:>10.1f} {r['max_ms']:>10.1f} "
+                f"{r['allocated_kib']:>10.1f} {r['peak_kib']:>10.1f} {r['elements']:>9}"
+            )
+
+
+if __name__ == "__main__":
+    main()
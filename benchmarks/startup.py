@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Startup benchmark for donate.py.
+#
+# Measures, each in a fresh interpreter so nothing is warm:
+#   * import  - time to import donate.py as a module
+#   * login   - time for the first AppTest run of the app (the login page)
+# and checks that pandas/fpdf are not pulled in by the login page.
+#
+#   python benchmarks/startup.py --repeat 5
+#   python benchmarks/startup.py --json > startup.json
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("pandas", "fpdf")
+
+IMPORT_PROBE = """
+import json, sys, time
+t = time.perf_counter()
+import donate
+elapsed = time.perf_counter() - t
+print(json.dumps([elapsed, [m for m in {heavy!r} if m in sys.modules]]))
+"""
+
+LOGIN_PROBE = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+t = time.perf_counter()
+at = AppTest.from_file("donate.py", default_timeout=60).run()
+elapsed = time.perf_counter() - t
+assert not at.exception, at.exception
+assert at.session_state.logged_in is False
+print(json.dumps([elapsed, [m for m in {heavy!r} if m in sys.modules]]))
+"""
+
+
+def run_probe(source, ledger_path):
+    env = dict(os.environ, DONATE_LEDGER_PATH=ledger_path)
+    out = subprocess.run(
+        [sys.executable, "-c", source.format(heavy=HEAVY_MODULES)],
+        cwd=APP_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    # The probe prints its result on the last line; Streamlit may log above it.
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure(source, repeat, ledger_path):
+    times, loaded = [], set()
+    for _ in range(repeat):
+        elapsed, heavy = run_probe(source, ledger_path)
+        times.append(elapsed)
+        loaded.update(heavy)
+    return {
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "max_s": max(times),
+        "heavy_modules_loaded": sorted(loaded),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for donate.py")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger_path = os.path.join(tmp, "donations.db")
+        results = {
+            "import": measure(IMPORT_PROBE, args.repeat, ledger_path),
+            "login": measure(LOGIN_PROBE, args.repeat, ledger_path),
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for phase, result in results.items():
+        heavy = ", ".join(result["heavy_modules_loaded"]) or "none"
+        print(
+            f"{phase:<8} min {result['min_s'] * 1000:8.1f} ms  "
+            f"median {result['median_s'] * 1000:8.1f} ms  "
+            f"max {result['max_s'] * 1000:8.1f} ms  heavy modules: {heavy}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import argparse
+import os
+import sys
+
+from catalog import load_catalog
+from ledger import DEFAULT_EVENT, DEFAULT_LEDGER_PATH, DonationLedger
+from schedule import FREQUENCIES
+
+# Bulk donation import and export.
+# Files are streamed in chunks (pandas for CSV, pyarrow for Parquet), so memory
+# stays bounded by the chunk size rather than the file size. Imported rows
+# are validated with the same rules as the donation form; rejected rows are
+# written to an optional rejects CSV with the reason.
+#
+#   python bulk_io.py import gala-2023.parquet --rejects rejects.csv
+#   python bulk_io.py export ledger.csv --from 2025-01-01 --organization "Malala Fund"
+#
+# File columns: donor (email), donor_name, date (YYYY-MM-DD), amount (whole
+# dollars), organizations (';'-separated), frequency and, optionally, event.
+
+MIN_DONATION = 5000
+MAX_DONATION = 1_000_000
+DEFAULT_CHUNK_SIZE = 50_000
+ORG_SEPARATOR = ";"
+COLUMNS = ["donor", "donor_name", "date", "amount", "organizations", "frequency", "event"]
+REQUIRED_COLUMNS = ["donor", "date", "amount", "organizations", "frequency"]
+
+
+def _format(path, fmt):
+    if fmt:
+        return fmt
+    return "parquet" if path.lower().endswith((".parquet", ".pq")) else "csv"
+
+
+def read_chunks(path, fmt=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    import pandas as pd
+
+    if _format(path, fmt) == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas().astype("string")
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size, dtype="string", keep_default_na=False)
+
+
+def validate_chunk(frame):
+    # Returns (valid rows, rejected rows with a "reason" column). Every check
+    # is a column-wise operation over the whole chunk.
+    import numpy as np
+    import pandas as pd
+
+    missing = [column for column in REQUIRED_COLUMNS if column not in frame]
+    if missing:
+        raise ValueError(f"missing required column(s): {', '.join(missing)}")
+    frame = frame.reset_index(drop=True)
+    for column in ("event", "donor_name"):
+        if column not in frame:
+            frame[column] = ""
+    for column in ("donor", "donor_name", "organizations", "frequency", "event"):
+        frame[column] = frame[column].fillna("").str.strip()
+    frame["event"] = frame["event"].where(frame["event"] != "", DEFAULT_EVENT)
+    frame["donor_name"] = frame["donor_name"].where(frame["donor_name"] != "", frame["donor"])
+
+    reason = pd.Series(pd.NA, index=frame.index, dtype="string")
+
+    def reject(mask, message):
+        reason[mask & reason.isna()] = message
+
+    reject(frame["donor"] == "", "missing donor email")
+
+    amount = pd.to_numeric(frame["amount"], errors="coerce")
+    reject(amount.isna() | (amount != amount.round()), "amount is not a whole-dollar number")
+    reject(amount < MIN_DONATION, f"amount below the ${MIN_DONATION:,} ticket minimum")
+    reject(amount > MAX_DONATION, f"amount above ${MAX_DONATION:,}")
+
+    dates = pd.to_datetime(frame["date"], format="%Y-%m-%d", errors="coerce")
+    reject(dates.isna(), "date is not YYYY-MM-DD")
+
+    reject(~frame["frequency"].isin(list(FREQUENCIES)), "unknown donation type")
+
+    orgs = frame["organizations"].str.split(ORG_SEPARATOR).explode().str.strip()
+    unknown = orgs[~orgs.isin(list(load_catalog()))]
+    reject(frame.index.isin(unknown.index.unique()), "unknown or missing organization")
+
+    rejected = reason.notna()
+    valid = frame[~rejected].copy()
+    valid["amount"] = amount[~rejected].astype(np.int64)
+    valid["date"] = dates[~rejected].dt.strftime("%Y-%m-%d")
+    rejects = frame[rejected].copy()
+    rejects["reason"] = reason[rejected]
+    return valid, rejects
+
+
+def _allocate(valid):
+    # Per-organization cents for every valid row, split by catalog weight.
+    from splits import split_batch
+
+    orgs = valid["organizations"].str.split(ORG_SEPARATOR).explode().str.strip()
+    group = valid.index.get_indexer(orgs.index)
+    catalog = load_catalog()
+    weights = orgs.map(lambda org: catalog[org]["weight"]).to_numpy()
+    cents = split_batch(group, valid["amount"].to_numpy() * 100, weights)
+    per_row = [[] for _ in range(len(valid))]
+    for row, (org, share) in zip(group, zip(orgs.tolist(), cents.tolist())):
+        per_row[row].append((org, share))
+    return per_row
+
+
+def _records(valid):
+    valid = valid.reset_index(drop=True)
+    allocations = _allocate(valid)
+    for row, split in zip(valid.itertuples(index=False), allocations):
+        yield {
+            "donor": row.donor,
+            "donor_name": row.donor_name,
+            "date": row.date,
+            "amount": int(row.amount),
+            "organizations": [org for org, _ in split],
+            "allocations": [share for _, share in split],
+            "frequency": row.frequency,
+            "event": row.event,
+        }
+
+
+def import_donations(ledger, path, fmt=None, chunk_size=DEFAULT_CHUNK_SIZE, rejects_path=None):
+    imported = rejected = 0
+    wrote_rejects = False
+    for chunk in read_chunks(path, fmt, chunk_size):
+        valid, rejects = validate_chunk(chunk)
+        # One transaction per chunk keeps commit overhead off the per-row cost.
+        imported += ledger.append_many(_records(valid), batch_size=chunk_size)
+        rejected += len(rejects)
+        if rejects_path and len(rejects):
+            rejects.to_csv(rejects_path, mode="a" if wrote_rejects else "w", header=not wrote_rejects, index=False)
+            wrote_rejects = True
+    return imported, rejected
+
+
+def export_donations(ledger, path, fmt=None, chunk_size=DEFAULT_CHUNK_SIZE, **filters):
+    import pandas as pd
+
+    fmt = _format(path, fmt)
+    writer = None
+    exported = 0
+    try:
+        for rows in ledger.iter_export_chunks(chunk_size, **filters):
+            frame = pd.DataFrame.from_records(rows, columns=COLUMNS)
+            if fmt == "parquet":
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+            else:
+                frame.to_csv(path, mode="a" if exported else "w", header=not exported, index=False)
+            exported += len(frame)
+    finally:
+        if writer is not None:
+            writer.close()
+    if not exported and fmt == "csv":
+        pd.DataFrame(columns=COLUMNS).to_csv(path, index=False)
+    return exported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import and export of the donation ledger.")
+    parser.add_argument("--ledger", default=DEFAULT_LEDGER_PATH)
+    parser.add_argument("--format", choices=["csv", "parquet"], help="Defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="Load a CSV/Parquet file of donations into the ledger")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--rejects", help="Write rejected rows and the reason to this CSV")
+
+    export_parser = commands.add_parser("export", help="Write (filtered) ledger rows to a CSV/Parquet file")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--from", dest="date_from")
+    export_parser.add_argument("--to", dest="date_to")
+    export_parser.add_argument("--donor")
+    export_parser.add_argument("--organization")
+    export_parser.add_argument("--event")
+
+    args = parser.parse_args(argv)
+    ledger = DonationLedger(args.ledger)
+
+    if args.command == "import":
+        if not os.path.exists(args.path):
+            sys.exit(f"No such file: {args.path}")
+        imported, rejected = import_donations(ledger, args.path, args.format, args.chunk_size, args.rejects)
+        print(f"Imported {imported:,} donations; rejected {rejected:,}")
+    else:
+        exported = export_donations(
+            ledger, args.path, args.format, args.chunk_size,
+            date_from=args.date_from, date_to=args.date_to, donor=args.donor,
+            organization=args.organization, event=args.event,
+        )
+        print(f"Exported {exported:,} donations to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import json
+import os
+import re
+from bisect import bisect_left
+from collections.abc import Mapping
+from functools import lru_cache
+
+# Partner organizations donors can support, shared by the app and the
+# command-line tools. The catalog is read from a JSON file (DONATE_CATALOG,
+# default data/organizations.json) once per process. Each entry has a name,
+# region, focus, description, "areas" (tags from INTEREST_AREAS, the same
+# labels as the login form's interests) and "weight", which sets its share
+# when a donation is split across several organizations.
+#
+# Region and area indexes and a sorted token list for prefix search are built
+# at load time, so filtering and searching never scan the whole catalog.
+
+CATALOG_PATH = os.environ.get(
+    "DONATE_CATALOG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "organizations.json"),
+)
+INTEREST_AREAS = [
+    "Girls' Education", "Conflict Zone Education", "Teacher Training",
+    "Educational Technology", "Adult Literacy", "Early Childhood Development",
+]
+
+_TOKEN = re.compile(r"\w+")
+
+
+def _tokens(text):
+    return _TOKEN.findall(text.lower().replace("'", ""))
+
+
+class Catalog(Mapping):
+    # Read-only mapping of organization name -> entry, in file order.
+
+    def __init__(self, entries):
+        self._entries = {}
+        self._by_region = {}
+        self._by_area = {}
+        postings = {}
+        for entry in entries:
+            name = entry["name"]
+            if name in self._entries:
+                raise ValueError(f"duplicate organization in catalog: {name}")
+            unknown = set(entry.get("areas", ())) - set(INTEREST_AREAS)
+            if unknown:
+                raise ValueError(f"{name}: unknown area(s) {', '.join(sorted(unknown))}")
+            entry = {"areas": [], "weight": 1, **entry}
+            self._entries[name] = entry
+            self._by_region.setdefault(entry["region"], []).append(name)
+            for area in entry["areas"]:
+                self._by_area.setdefault(area, []).append(name)
+            text = " ".join([name, entry["region"], entry["focus"], entry["description"], *entry["areas"]])
+            for token in _tokens(text):
+                postings.setdefault(token, set()).add(name)
+        self._order = {name: i for i, name in enumerate(self._entries)}
+        # Full-text index: token -> names, with the tokens sorted so every
+        # token sharing a prefix is one contiguous bisect range.
+        self._postings = postings
+        self._token_list = sorted(postings)
+
+    @classmethod
+    def from_file(cls, path=CATALOG_PATH):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def __getitem__(self, name):
+        return self._entries[name]
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Indexes
+
+    def regions(self):
+        return sorted(self._by_region)
+
+    def _prefix_matches(self, prefix):
+        names = set()
+        i = bisect_left(self._token_list, prefix)
+        while i < len(self._token_list) and self._token_list[i].startswith(prefix):
+            names |= self._postings[self._token_list[i]]
+            i += 1
+        return names
+
+    def search(self, query="", region=None, areas=(), limit=None):
+        # Organizations where every query word prefixes some word of the
+        # entry, optionally limited to a region and to any of `areas`.
+        # Names starting with the query come first, then catalog order.
+        candidates = None
+        for token in _tokens(query):
+            matches = self._prefix_matches(token)
+            candidates = matches if candidates is None else candidates & matches
+            if not candidates:
+                return []
+        if region:
+            region_names = set(self._by_region.get(region, ()))
+            candidates = region_names if candidates is None else candidates & region_names
+        if areas:
+            area_names = set().union(*(self._by_area.get(area, ()) for area in areas))
+            candidates = area_names if candidates is None else candidates & area_names
+        if candidates is None:
+            candidates = self._entries.keys()
+        query = query.strip().lower()
+        ranked = sorted(
+            candidates,
+            key=lambda name: (not (query and name.lower().startswith(query)), self._order[name]),
+        )
+        return ranked if limit is None else ranked[:limit]
+
+
+@lru_cache(maxsize=None)
+def load_catalog(path=CATALOG_PATH):
+    return Catalog.from_file(path)
@@ -0,0 +1 @@
+# Lets the tests import the app modules from the repository root.
@@ -1,9 +1,20 @@
+import os
 import streamlit as st
-import pandas as pd
 from datetime import datetime, date
-import time
-from io import BytesIO
-from fpdf import FPDF
+from ledger import TICKET_MINIMUM, DonationLedger
+from auth import LOGIN_LINK_TTL, SESSION_COOKIE, SESSION_TTL, AuthService, mailer_from_env
+from leaderboard import Leaderboard
+from aggregates import AggregateCache
+from receipts import ReceiptCache
+from statements import render_statement
+from splits import split_cents
+from schedule import FREQUENCIES
+from seating import MEAL_OPTIONS, TABLE_COUNT, SeatingError, SeatingService
+import templates
+from catalog import INTEREST_AREAS, load_catalog
+from events import DonationFeed
+from payments import CHARGED, SUCCEEDED, UNRECORDED, UNSETTLED, PaymentPipeline, gateway_from_env, new_idempotency_key
+import metrics
 
 # Page configuration
 st.set_page_config(
@@ -13,225 +24,175 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS for styling
-st.markdown("""
-<style>
-    html, body, .stApp {
-        font-family: 'Segoe UI', 'Roboto', 'Helvetica Neue', Arial, sans-serif !important;
-        background: linear-gradient(135deg, #101418 0%, #181c20 100%) !important;
-        color: #f8fff8 !important;
-    }
-    .block-container {
-        max-width: 900px !important;
-        margin: 0 auto !important;
-        padding: 2.5rem 2rem 2.5rem 2rem !important;
-        background: #181c20 !important;
-        border-radius: 18px !important;
-        box-shadow: 0 8px 32px 0 rgba(0,0,0,0.25);
-    }
-    .main-header {
-        font-size: 3.2rem;
-        color: #eaffd0;
-        text-align: center;
-        margin-bottom: 2.2rem;
-        font-weight: 800;
-        text-shadow: 0 2px 12px #081c15;
-        letter-spacing: 1.5px;
-        padding-top: 0.5rem;
-    }
-    .subtitle {
-        font-size: 1.35rem;
-        color: #b7e4c7;
-        text-align: center;
-        margin-bottom: 2.5rem;
-        font-weight: 500;
-    }
-    .section-divider {
-        border: none;
-        border-top: 2px solid #40916c;
-        margin: 2.5rem 0 2rem 0;
-    }
-    .donation-card, .stats-card, .success-message {
-        background: #23272b !important;
-        color: #f8fff8 !important;
-        border-radius: 16px;
-        box-shadow: 0 4px 24px 0 rgba(0,0,0,0.18);
-        margin: 1.5rem 0;
-        padding: 2rem 2rem 1.5rem 2rem;
-        transition: box-shadow 0.2s;
-    }
-    .donation-card:hover, .stats-card:hover {
-        box-shadow: 0 8px 32px 0 rgba(0,0,0,0.28);
-    }
-    .stats-card {
-        background: #181c20 !important;
-        border-left: 6px solid #40916c;
-        padding: 1.5rem 2rem;
-        margin: 1.2rem 0;
-    }
-    .success-message {
-        background: #183a1d !important;
-        border-left: 6px solid #38b000;
-        color: #eaffd0 !important;
-        font-weight: 600;
-    }
-    .stButton>button {
-        background: linear-gradient(90deg, #204529 0%, #40916c 100%) !important;
-        color: #f8fff8 !important;
-        border: none !important;
-        border-radius: 12px !important;
-        font-weight: 700 !important;
-        font-size: 1.15rem !important;
-        padding: 0.8rem 2rem !important;
-        box-shadow: 0 2px 8px 0 rgba(0,0,0,0.18);
-        margin-top: 0.7rem;
-        transition: background 0.2s, color 0.2s, box-shadow 0.2s;
-    }
-    .stButton>button:hover {
-        background: linear-gradient(90deg, #38b000 0%, #081c15 100%) !important;
-        color: #eaffd0 !important;
-        box-shadow: 0 4px 16px 0 rgba(0,0,0,0.28);
-    }
-    .stTextInput>div>input, .stTextInput>div>textarea {
-        background: #23272b !important;
-        color: #eaffd0 !important;
-        border-radius: 10px !important;
-        border: 2px solid #40916c !important;
-        font-size: 1.05rem !important;
-        padding: 0.6rem 1.1rem !important;
-        margin-bottom: 0.5rem !important;
-    }
-    .stDataFrame, .stDataFrame table {
-        background: #181c20 !important;
-        color: #eaffd0 !important;
-        border-radius: 10px !important;
-        font-size: 1.05rem !important;
-    }
-    .stMetric {
-        background: #23272b !important;
-        color: #eaffd0 !important;
-        border-radius: 12px !important;
-        font-weight: 700 !important;
-        font-size: 1.1rem !important;
-        margin-bottom: 1rem !important;
-    }
-    .stSelectbox>div>div, .stMultiSelect>div>div {
-        background: #23272b !important;
-        color: #eaffd0 !important;
-        border-radius: 10px !important;
-        font-size: 1.05rem !important;
-    }
-    .stNumberInput>div>input {
-        background: #23272b !important;
-        color: #eaffd0 !important;
-        border-radius: 10px !important;
-        border: 2px solid #40916c !important;
-        font-size: 1.05rem !important;
-    }
-    .stSidebar {
-        background: #181c20 !important;
-        color: #eaffd0 !important;
-        border-right: 2px solid #40916c;
-        padding-top: 2rem !important;
-        padding-bottom: 2rem !important;
-        border-radius: 0 18px 18px 0 !important;
-        box-shadow: 2px 0 16px 0 rgba(0,0,0,0.18);
-    }
-    .stExpanderHeader {
-        background: #23272b !important;
-        color: #eaffd0 !important;
-        border-radius: 10px 10px 0 0 !important;
-        font-weight: 600;
-    }
-    .stExpanderContent {
-        background: #181c20 !important;
-        color: #eaffd0 !important;
-        border-radius: 0 0 10px 10px !important;
-    }
-    /* Scrollbar */
-    ::-webkit-scrollbar {
-        width: 8px;
-        background: #23272b;
-    }
-    ::-webkit-scrollbar-thumb {
-        background: #40916c;
-        border-radius: 4px;
-    }
-    /* Form tweaks */
-    .stForm {
-        margin-top: 1.5rem !important;
-        margin-bottom: 1.5rem !important;
-        padding: 1.5rem 1.5rem 1rem 1.5rem !important;
-        background: #23272b !important;
-        border-radius: 14px !important;
-        box-shadow: 0 2px 12px 0 rgba(0,0,0,0.18);
-    }
-    /* Responsive tweaks */
-    @media (max-width: 900px) {
-        .block-container {
-            padding: 1rem !important;
-        }
-        .main-header {
-            font-size: 2.1rem;
-        }
-    }
-</style>
-""", unsafe_allow_html=True)
+# Section timings and rerun counts (no-op unless DONATE_METRICS is set)
+metrics.start_exporters()
+metrics.record_rerun()
+
+# Custom CSS for styling (static/donate.css, cached by the browser)
+st.markdown(templates.stylesheet_tag(st.get_option("server.enableStaticServing")), unsafe_allow_html=True)
 
 # Initialize session state
 if 'logged_in' not in st.session_state:
     st.session_state.logged_in = False
 if 'user_name' not in st.session_state:
     st.session_state.user_name = ""
-if 'total_donations' not in st.session_state:
-    st.session_state.total_donations = 0
+if 'user_email' not in st.session_state:
+    st.session_state.user_email = ""
 if 'ticket_purchased' not in st.session_state:
     st.session_state.ticket_purchased = False
-if 'donation_history' not in st.session_state:
-    st.session_state.donation_history = []
-
-# Global organizations data
-organizations = {
-    "Room to Read": {
-        "region": "Global",
-        "focus": "Girls' education and literacy",
-        "description": "Working in 17 countries to transform millions of lives through education"
-    },
-    "Malala Fund": {
-        "region": "Global",
-        "focus": "Girls' education advocacy",
-        "description": "Advocating for 12 years of free, safe, quality education for every girl"
-    },
-    "Teach for All": {
-        "region": "Global",
-        "focus": "Teacher training and leadership",
-        "description": "Developing collective leadership to ensure all children can fulfill their potential"
-    },
-    "Save the Children": {
-        "region": "Conflict Zones",
-        "focus": "Emergency education",
-        "description": "Providing education in emergencies and conflict-affected areas"
-    },
-    "World Vision Education": {
-        "region": "Sub-Saharan Africa",
-        "focus": "Community-based education",
-        "description": "Building schools and training teachers in underserved communities"
-    },
-    "UNICEF Education": {
-        "region": "Global",
-        "focus": "Universal education access",
-        "description": "Working to ensure every child has access to quality education"
-    }
+if 'donation_key' not in st.session_state:
+    st.session_state.donation_key = new_idempotency_key()
+
+# Donation ledger shared by every session in this process
+@st.cache_resource
+def get_ledger():
+    return DonationLedger()
+
+# Leaderboard seeded from the ledger once per process and updated on each donation
+@st.cache_resource
+def get_leaderboard():
+    return Leaderboard.from_ledger(get_ledger())
+
+# Running totals per donor, organization and event, shared by all sessions
+@st.cache_resource
+def get_aggregates():
+    return AggregateCache(get_ledger())
+
+# Guest accounts, sign-in links and server-side sessions
+@st.cache_resource
+def get_auth():
+    return AuthService()
+
+# Sends the sign-in links (DONATE_MAILER; "outbox" writes them to a local file)
+@st.cache_resource
+def get_mailer():
+    return mailer_from_env()
+
+# Table reservations, checked against capacity and meal limits
+@st.cache_resource
+def get_seating():
+    return SeatingService()
+
+# Rendered PDF receipts, keyed by a hash of the donation record
+@st.cache_resource
+def get_receipt_cache():
+    return ReceiptCache()
+
+# Rendered tax statements, keyed by a hash of the statement figures
+@st.cache_resource
+def get_statement_cache():
+    return ReceiptCache(render=render_statement)
+
+# Payment pipeline: charges run on a background event loop and successful
+# donations are written to the ledger from there (at most once per key)
+@st.cache_resource
+def get_payments():
+    ledger = get_ledger()
+    leaderboard = get_leaderboard()
+    aggregates = get_aggregates()
+
+    def record_donation(payment):
+        ledger.add(payment)
+        aggregates.sync()
+        leaderboard.sync(ledger)
+
+    return PaymentPipeline(gateway_from_env(), on_success=record_donation)
+
+# Live feed of ledger donations from every worker process; it keeps this
+# process's leaderboard and aggregates current and backs the live views
+@st.cache_resource
+def get_feed():
+    ledger = get_ledger()
+    leaderboard = get_leaderboard()
+    aggregates = get_aggregates()
+    feed = DonationFeed(ledger)
+    feed.subscribe(leaderboard.apply)
+    feed.subscribe(aggregates.apply)
+    # Batches the feed published before the subscriptions went to nobody.
+    leaderboard.sync(ledger)
+    aggregates.sync()
+    return feed
+
+def start_session(account, token):
+    st.session_state.logged_in = True
+    st.session_state.session_token = token
+    st.session_state.user_name = account["name"]
+    st.session_state.user_email = account["email"]
+    st.session_state.user_interests = account["interests"]
+    st.session_state.ticket_purchased = get_aggregates().donor(account["email"])["max_amount"] >= TICKET_MINIMUM
+    rsvp = get_seating().get(account["email"])
+    if rsvp and rsvp["table"]:
+        st.session_state.rsvp_info = rsvp
+
+def end_session():
+    # Logout button callback: revokes the session server-side and clears the
+    # cookie; the next run re-initializes session state.
+    token = st.session_state.get('session_token')
+    if token:
+        get_auth().logout(token)
+    for key in list(st.session_state):
+        del st.session_state[key]
+    st.session_state.session_cookie = ("", 0)
+
+# Sign-in link from the login email: redeemed once, then dropped from the URL
+if "login" in st.query_params:
+    login = get_auth().complete_login(st.query_params["login"])
+    del st.query_params["login"]
+    if login:
+        account, token = login
+        start_session(account, token)
+        st.session_state.session_cookie = (token, SESSION_TTL)
+        st.session_state.flash = "Welcome! You now have access to make donations and secure your ticket."
+    else:
+        st.session_state.login_error = "That sign-in link has expired or was already used. Please request a new one."
+# A reload presents the session cookie instead of signing in again
+elif not st.session_state.logged_in and SESSION_COOKIE in st.context.cookies:
+    token = st.context.cookies[SESSION_COOKIE]
+    account = get_auth().session_account(token)
+    if account:
+        start_session(account, token)
+
+def current_donor_total():
+    return get_aggregates().donor(st.session_state.user_email)["total"]
+
+# Sign-in links point back at this app
+APP_URL = os.environ.get("DONATE_APP_URL", "http://localhost:8501/")
+LEADERBOARD_SIZE = 5
+# The projector page (?view=live) checks the feed this often and re-renders
+# only when it has moved
+LIVE_REFRESH_SECONDS = 2
+FUNDRAISING_GOAL = 1_000_000
+ORG_SUGGESTIONS = 20
+HISTORY_PAGE_SIZE = 25
+HISTORY_SORTS = {
+    "Newest first": "date_desc",
+    "Oldest first": "date_asc",
+    "Largest first": "amount_desc",
+    "Smallest first": "amount_asc"
 }
 
+
+@metrics.timed("main")
 def main():
+    get_feed()
+    
     # Header
-    st.markdown('<h1 class="main-header">🎓 Global Education Inequality Ball</h1>', unsafe_allow_html=True)
-    st.markdown('<p class="subtitle">A Biannual Gala for Global Education Equality</p>', unsafe_allow_html=True)
-    st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
+    st.markdown(templates.HEADER_HTML, unsafe_allow_html=True)
+    
+    # Session cookie set at sign-in or cleared at logout (from an empty frame)
+    cookie = st.session_state.pop('session_cookie', None)
+    if cookie:
+        st.iframe(templates.session_cookie_script(SESSION_COOKIE, *cookie), height="content")
+    
+    # Projector mode (?view=live): running total and leaderboard only
+    if st.query_params.get("view") == "live":
+        live_thermometer()
+        leaderboard_section()
+        live_updates()
+        return
     
     # Sidebar
-    with st.sidebar:
+    with st.sidebar, metrics.timer("sidebar"):
         st.image("https://images.unsplash.com/photo-1503676260728-1c00da094a0b?w=400", 
                 caption="Education is a human right")
         
@@ -240,11 +201,17 @@ def main():
             st.write("You must log in and make a substantial donation to secure your ticket to this exclusive gala.")
         else:
             st.header(f"Welcome, {st.session_state.user_name}!")
-            st.write(f"Total Donations: ${st.session_state.total_donations:,}")
-            if st.session_state.ticket_purchased:
-                st.success("✅ Ticket Secured!")
-            else:
-                st.warning("⚠️ Minimum $5,000 donation required for ticket")
+            st.button("Log out", on_click=end_session)
+            sidebar_totals()
+    
+    # Confirmation from the previous run (e.g. login), shown without blocking
+    flash = st.session_state.pop('flash', None)
+    if flash:
+        st.toast(flash, icon="🎉")
+    
+    # Pick up the outcome of a payment submitted on an earlier run
+    if st.session_state.logged_in:
+        check_pending_payment()
     
     # Main content
     if not st.session_state.logged_in:
@@ -252,7 +219,61 @@ def main():
     else:
         main_dashboard()
 
+@metrics.timed("sidebar_totals")
+def sidebar_totals():
+    st.write(f"Total Donations: ${current_donor_total():,}")
+    if st.session_state.ticket_purchased:
+        st.success("✅ Ticket Secured!")
+    else:
+        st.warning("⚠️ Minimum $5,000 donation required for ticket")
+
+@metrics.timed("check_pending_payment")
+def check_pending_payment():
+    key = st.session_state.get('pending_payment')
+    if not key:
+        return
+    status = get_payments().status(key)
+    if status is not None and status["state"] in UNSETTLED:
+        return
+    
+    st.session_state.pending_payment = None
+    st.session_state.donation_key = new_idempotency_key()
+    if status is None:
+        # Not known to this process's pipeline (e.g. the app restarted)
+        st.session_state.payment_notice = ("unknown", "We couldn't confirm this payment. Please check your donation history before donating again.")
+    elif status["state"] == SUCCEEDED:
+        payment = status["payment"]
+        st.session_state.ticket_purchased = True
+        st.session_state.last_donation = {
+            "date": payment["date"],
+            "amount": payment["amount"],
+            "organizations": payment["organizations"],
+            "frequency": payment["frequency"]
+        }
+        st.session_state.receipt_requested = False
+        st.session_state.payment_notice = ("success", payment["amount"])
+    elif status["state"] == UNRECORDED:
+        # Charged, but the ledger write kept failing; the team has the details
+        st.session_state.payment_notice = ("unrecorded", f"Your card was charged (reference {status['transaction_id']}), but we couldn't record your donation yet. Our team has been alerted and will add it to your history; please don't donate again.")
+    else:
+        st.session_state.payment_notice = ("error", status.get("error", "Payment failed"))
+
+# Polls the payment pipeline without blocking the rest of the page
+@st.fragment(run_every=1)
+@metrics.timed("payment_status_poller", fragment=True)
+def payment_status_poller():
+    status = get_payments().status(st.session_state.pending_payment)
+    if status is None or status["state"] not in UNSETTLED:
+        st.rerun()
+    elif status["state"] == CHARGED:
+        st.info("⏳ Payment received, recording your donation...")
+    else:
+        st.info("⏳ Processing your donation...")
+
+@metrics.timed("login_section")
 def login_section():
+    # Raises on a missing mailer setting before anyone fills in the form
+    get_mailer()
     col1, col2, col3 = st.columns([1, 2, 1])
     
     with col2:
@@ -274,86 +295,144 @@ def login_section():
             
             education_interest = st.multiselect(
                 "Areas of interest in education",
-                ["Girls' Education", "Conflict Zone Education", "Teacher Training", 
-                 "Educational Technology", "Adult Literacy", "Early Childhood Development"]
+                INTEREST_AREAS
             )
             
             submit = st.form_submit_button("🔓 Request Access", use_container_width=True)
             
             if submit and name and email:
-                st.session_state.logged_in = True
-                st.session_state.user_name = name
-                st.success("Welcome! You now have access to make donations and secure your ticket.")
-                time.sleep(1)
-                st.rerun()
+                # Access is granted from the emailed link, which proves the
+                # guest owns this address
+                metrics.increment("logins")
+                with metrics.timer("submit_login"):
+                    code = get_auth().request_login(email, name, organization, previous_donations, education_interest)
+                    get_mailer().send(
+                        email,
+                        "Your Global Education Inequality Ball sign-in link",
+                        f"Open this link to sign in: {APP_URL}?login={code}\n"
+                        f"It works once and expires in {LOGIN_LINK_TTL // 60} minutes.",
+                    )
+                st.session_state.login_link_sent = email
+        
+        error = st.session_state.pop('login_error', None)
+        if error:
+            st.error(f"❌ {error}")
+        if st.session_state.get('login_link_sent'):
+            st.success(f"📧 We've emailed a sign-in link to {st.session_state.login_link_sent}. Open it to continue.")
 
 def main_dashboard():
+    # Each section below reruns on its own when one of its widgets changes;
+    # anything that affects other sections (a settled payment) reruns the app.
+    event_info_section()
+    leaderboard_section()
+    donation_section()
+    receipt_section()
+    if st.session_state.ticket_purchased:
+        ticket_section()
+    history_section()
+
+@metrics.timed("event_info_section")
+def event_info_section():
     # Event Information
     st.header("🌍 About the Global Education Inequality Ball")
-    st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
+    st.markdown(templates.SECTION_DIVIDER_HTML, unsafe_allow_html=True)
     
     col1, col2 = st.columns([2, 1])
     
     with col1:
-        st.write("""
-        **Next Event**: March 15, 2025 | New York City
-        
-        The Global Education Inequality Ball brings together influential leaders, philanthropists, 
-        and advocates to address the crisis of education access affecting 250 million children worldwide.
-        
-        This exclusive biannual gala focuses on:
-        - **Gender Equality**: Supporting the 122 million girls without access to education
-        - **Conflict Zones**: Rebuilding education systems in war-torn regions
-        - **Digital Divide**: Providing internet access and technology
-        - **Teacher Training**: Supporting educators in underserved communities
-        """)
+        st.markdown(templates.EVENT_INTRO_MD)
+        live_thermometer()
     
     with col2:
-        st.markdown("""
-        <div class="stats-card">
-            <h3>🎯 Impact Goals</h3>
-            <ul>
-                <li><strong>250M</strong> children out of school</li>
-                <li><strong>122M</strong> girls denied education</li>
-                <li><strong>$5B</strong> funding gap annually</li>
-                <li><strong>17</strong> countries in crisis</li>
-            </ul>
-        </div>
-        """, unsafe_allow_html=True)
-
-    # Top Donors Leaderboard (Sample Data)
-    st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
+        st.markdown(templates.IMPACT_GOALS_HTML, unsafe_allow_html=True)
+
+# Running gala total from the live feed; reads a snapshot the feed has
+# already updated, so a render never queries the ledger
+@metrics.timed("live_thermometer")
+def live_thermometer():
+    live = get_feed().snapshot()
+    st.session_state.live_version = live["version"]
+    st.progress(min(live["total"] / FUNDRAISING_GOAL, 1.0), text=f"${live['total']:,} raised of our ${FUNDRAISING_GOAL:,} goal")
+    metric_col1, metric_col2 = st.columns(2)
+    with metric_col1:
+        st.metric("Donations", f"{live['donation_count']:,}")
+    with metric_col2:
+        st.metric("Tickets Secured", f"{live['tickets']:,}")
+    if live["recent"]:
+        st.caption("Latest: " + " · ".join(f"{d['donor_name']} ${d['amount']:,}" for d in live["recent"][:3]))
+
+# Projector page only: a cheap version check on a timer; the page is rerun
+# (thermometer and leaderboard redrawn) only when the feed has published
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+@metrics.timed("live_updates", fragment=True)
+def live_updates():
+    if get_feed().snapshot()["version"] != st.session_state.get('live_version'):
+        st.rerun()
+
+@st.fragment
+@metrics.timed("leaderboard_section", fragment=True)
+def leaderboard_section():
+    # Top Donors Leaderboard
+    st.markdown(templates.SECTION_DIVIDER_HTML, unsafe_allow_html=True)
     st.subheader("🏆 Top Donors Leaderboard")
-    leaderboard_data = [
-        {"Name": "Ava Smith", "Amount": 50000},
-        {"Name": "Liam Chen", "Amount": 35000},
-        {"Name": "Noah Patel", "Amount": 25000},
-        {"Name": "Sophia Lee", "Amount": 20000},
-        {"Name": "You", "Amount": st.session_state.total_donations},
+    leaderboard = get_leaderboard()
+    donor = st.session_state.user_email
+    leaderboard_rows = [
+        {
+            "Rank": entry["rank"],
+            "Name": "You" if entry["donor"] == donor else entry["name"],
+            "Amount": f"$ {entry['total']:,}"
+        }
+        for entry in leaderboard.top(LEADERBOARD_SIZE)
     ]
-    leaderboard_df = pd.DataFrame(leaderboard_data).sort_values(by="Amount", ascending=False).reset_index(drop=True)
     st.markdown('<div class="donation-card">', unsafe_allow_html=True)
-    st.table(leaderboard_df.style.format({"Amount": "$ {:,.0f}"}))
+    if leaderboard_rows:
+        st.table(leaderboard_rows)
+    else:
+        st.write("No donations yet. Be the first on the leaderboard!")
     st.markdown('</div>', unsafe_allow_html=True)
-    
+    your_rank = leaderboard.rank(donor)
+    if your_rank is not None and your_rank > LEADERBOARD_SIZE:
+        st.caption(f"Your rank: #{your_rank:,} of {len(leaderboard):,} donors (${leaderboard.total_for(donor):,})")
+
+@st.fragment
+@metrics.timed("donation_section", fragment=True)
+def donation_section():
     # Donation Section
     st.header("💰 Make Your Impact")
-    st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
+    st.markdown(templates.SECTION_DIVIDER_HTML, unsafe_allow_html=True)
     st.write("**Minimum donation of $5,000 required to secure your exclusive gala ticket.**")
     
-    # Organization selection
+    # Organization selection: search and filters narrow the suggestions,
+    # starting from the areas of interest given at login
+    catalog = load_catalog()
+    if 'selected_orgs' not in st.session_state:
+        st.session_state.selected_orgs = catalog.search(areas=st.session_state.get('user_interests', ()), limit=3) or list(catalog)[:3]
+    
+    search_col1, search_col2, search_col3 = st.columns([2, 1, 2])
+    with search_col1:
+        org_query = st.text_input("Search organizations", placeholder="Name, focus or keyword", key="org_query")
+    with search_col2:
+        org_region = st.selectbox("Region", ["All regions"] + catalog.regions(), key="org_region")
+    with search_col3:
+        org_areas = st.multiselect("Focus areas", INTEREST_AREAS, key="org_areas")
+    
+    matches = catalog.search(org_query, region=None if org_region == "All regions" else org_region, areas=org_areas)
+    suggestions = [org for org in matches if org not in st.session_state.selected_orgs][:ORG_SUGGESTIONS]
     selected_orgs = st.multiselect(
         "Select organizations to support:",
-        list(organizations.keys()),
-        default=list(organizations.keys())[:3]
+        st.session_state.selected_orgs + suggestions,
+        key="selected_orgs"
     )
+    st.caption(f"{len(matches):,} of {len(catalog):,} organizations match" + (f"; showing the first {ORG_SUGGESTIONS}" if len(matches) > ORG_SUGGESTIONS else ""))
     
     if selected_orgs:
         # Display selected organizations
         for org in selected_orgs:
-            with st.expander(f"📚 {org} - {organizations[org]['region']}"):
-                st.write(f"**Focus**: {organizations[org]['focus']}")
-                st.write(organizations[org]['description'])
+            with st.expander(f"📚 {org} - {catalog[org]['region']}"):
+                st.write(f"**Focus**: {catalog[org]['focus']}")
+                st.write(catalog[org]['description'])
+                st.caption(f"Raised so far: ${get_aggregates().organization(org)['total_cents'] / 100:,.2f}")
     
     # Donation form
     with st.form("donation_form"):
@@ -372,15 +451,15 @@ def main_dashboard():
         with col2:
             donation_frequency = st.selectbox(
                 "Donation Type",
-                ["One-time", "Monthly for 1 year", "Annual for 5 years"]
+                list(FREQUENCIES)
             )
         
-        # Split donation across organizations
+        # Split donation across organizations, exact to the cent
+        allocations = split_cents(donation_amount * 100, [catalog[org]["weight"] for org in selected_orgs])
         if selected_orgs and len(selected_orgs) > 1:
             st.write("**Donation Distribution:**")
-            split_amount = donation_amount / len(selected_orgs)
-            for org in selected_orgs:
-                st.write(f"• {org}: ${split_amount:,.2f}")
+            for org, cents in zip(selected_orgs, allocations):
+                st.write(f"• {org}: ${cents / 100:,.2f}")
         
         # Payment details (simulated)
         st.subheader("💳 Payment Information")
@@ -395,52 +474,49 @@ def main_dashboard():
         submit_donation = st.form_submit_button("🎯 Complete Donation & Secure Ticket", use_container_width=True)
         
         if submit_donation and donation_amount >= 5000:
-            # Process donation
-            st.session_state.total_donations += donation_amount
-            st.session_state.ticket_purchased = True
-            
-            # Add to donation history
-            donation_record = {
-                "date": datetime.now().strftime("%Y-%m-%d"),
-                "amount": donation_amount,
-                "organizations": selected_orgs,
-                "frequency": donation_frequency
-            }
-            st.session_state.donation_history.append(donation_record)
-            st.session_state.last_donation = donation_record
-            
-            # Success message
-            st.balloons()
-            st.markdown(f"""
-            <div class="success-message">
-                <h3>🎉 Donation Successful!</h3>
-                <p><strong>${donation_amount:,}</strong> donated to support global education equality</p>
-                <p>Your exclusive gala ticket has been secured!</p>
-            </div>
-            """, unsafe_allow_html=True)
+            # Queue the payment; resubmitting with the same key is a no-op
+            metrics.increment("donations_submitted")
+            with metrics.timer("submit_donation"):
+                payment = {
+                    "donor": st.session_state.user_email,
+                    "donor_name": st.session_state.user_name,
+                    "date": datetime.now().strftime("%Y-%m-%d"),
+                    "amount": donation_amount,
+                    "organizations": selected_orgs,
+                    "allocations": allocations,
+                    "frequency": donation_frequency,
+                    "card_last4": card_number.replace(" ", "")[-4:]
+                }
+                get_payments().submit(st.session_state.donation_key, payment)
+                st.session_state.pending_payment = st.session_state.donation_key
         
         elif submit_donation and donation_amount < 5000:
             st.error("❌ Minimum donation of $5,000 required to secure your gala ticket.")
 
-    # Show PDF download button after form, if last_donation is set
+    if st.session_state.get('pending_payment'):
+        payment_status_poller()
+    
+    notice = st.session_state.pop('payment_notice', None)
+    if notice and notice[0] == "success":
+        # Success message
+        st.balloons()
+        st.markdown(templates.success_card(notice[1]), unsafe_allow_html=True)
+    elif notice and notice[0] in ("unknown", "unrecorded"):
+        st.warning(f"⚠️ {notice[1]}")
+    elif notice:
+        st.error(f"❌ Payment failed: {notice[1]}")
+
+@st.fragment
+@metrics.timed("receipt_section", fragment=True)
+def receipt_section():
+    # Receipt is only rendered once the donor asks for it, then served from the cache
     if 'last_donation' in st.session_state and st.session_state.last_donation:
-        def generate_pdf_receipt(donation, user_name):
-            pdf = FPDF()
-            pdf.add_page()
-            pdf.set_font("Arial", size=16)
-            pdf.cell(0, 12, "Donation Receipt", ln=True, align="C")
-            pdf.set_font("Arial", size=12)
-            pdf.ln(8)
-            pdf.cell(0, 10, f"Date: {donation['date']}", ln=True)
-            pdf.cell(0, 10, f"Donor: {user_name}", ln=True)
-            pdf.cell(0, 10, f"Amount: ${donation['amount']:,}", ln=True)
-            pdf.cell(0, 10, f"Organizations: {', '.join(donation['organizations'])}", ln=True)
-            pdf.cell(0, 10, f"Donation Type: {donation['frequency']}", ln=True)
-            pdf.ln(8)
-            pdf.multi_cell(0, 10, "Thank you for your generous support of global education equality!\nThis receipt can be used for your records.")
-            return pdf.output(dest='S').encode('latin1')
-        pdf_bytes = generate_pdf_receipt(st.session_state.last_donation, st.session_state.user_name)
-        if pdf_bytes:
+        if not st.session_state.get('receipt_requested'):
+            if st.button("📄 Prepare Donation Receipt (PDF)", use_container_width=True):
+                st.session_state.receipt_requested = True
+        if st.session_state.get('receipt_requested'):
+            with metrics.timer("receipt_render"):
+                pdf_bytes = get_receipt_cache().get(st.session_state.last_donation, st.session_state.user_name)
             st.download_button(
                 label="📄 Download Donation Receipt (PDF)",
                 data=pdf_bytes,
@@ -448,75 +524,102 @@ def main_dashboard():
                 mime="application/pdf",
                 use_container_width=True
             )
-    
+
+@st.fragment
+@metrics.timed("ticket_section", fragment=True)
+def ticket_section():
     # Ticket Status
-    if st.session_state.ticket_purchased:
-        st.header("🎫 Your Gala Ticket")
-        st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
-        ticket_col1, ticket_col2 = st.columns([1, 1])
-        
-        with ticket_col1:
-            st.markdown("""
-            <div class="donation-card">
-                <h3>🌟 VIP Gala Access Confirmed</h3>
-                <p><strong>Event</strong>: Global Education Inequality Ball 2025</p>
-                <p><strong>Date</strong>: March 15, 2025</p>
-                <p><strong>Venue</strong>: The Plaza Hotel, New York</p>
-                <p><strong>Dress Code</strong>: Black-tie with educational theme elements</p>
-                <p><strong>Your Contribution</strong>: $""" + f"{st.session_state.total_donations:,}" + """</p>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with ticket_col2:
-            st.subheader("🎭 Event Highlights")
-            st.write("""
-            - **Keynote**: Malala Yousafzai
-            - **Performance**: Global Youth Orchestra
-            - **Auction**: Rare books & educational experiences
-            - **Awards**: Global Education Champions
-            - **Networking**: 500+ philanthropists & leaders
-            """)
-
-        # RSVP & Table Selection
-        st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
-        st.subheader("🍽️ RSVP & Table Selection")
-        if 'rsvp_info' not in st.session_state:
-            with st.form("rsvp_form"):
-                meal = st.selectbox("Meal Preference", ["Vegetarian", "Vegan", "Chicken", "Fish", "Beef", "Gluten-Free"])
-                table = st.number_input("Preferred Table Number (1-50)", min_value=1, max_value=50, value=1)
-                special = st.text_area("Special Requests (optional)")
-                submit_rsvp = st.form_submit_button("RSVP Now", use_container_width=True)
-                if submit_rsvp:
-                    st.session_state.rsvp_info = {
-                        "meal": meal,
-                        "table": table,
-                        "special": special
-                    }
-                    st.success("Your RSVP has been received! We look forward to seeing you at the gala.")
-        else:
-            rsvp = st.session_state.rsvp_info
-            st.markdown(f"""
-            <div class="donation-card">
-                <h4>✅ RSVP Confirmed</h4>
-                <ul>
-                    <li><strong>Meal:</strong> {rsvp['meal']}</li>
-                    <li><strong>Table:</strong> {rsvp['table']}</li>
-                    <li><strong>Special Requests:</strong> {rsvp['special'] if rsvp['special'] else 'None'}</li>
-                </ul>
-            </div>
-            """, unsafe_allow_html=True)
+    st.header("🎫 Your Gala Ticket")
+    st.markdown(templates.SECTION_DIVIDER_HTML, unsafe_allow_html=True)
+    ticket_col1, ticket_col2 = st.columns([1, 1])
     
+    with ticket_col1:
+        st.markdown(templates.ticket_card(current_donor_total()), unsafe_allow_html=True)
+    
+    with ticket_col2:
+        st.subheader("🎭 Event Highlights")
+        st.markdown(templates.EVENT_HIGHLIGHTS_MD)
+
+    # RSVP & Table Selection
+    st.markdown(templates.SECTION_DIVIDER_HTML, unsafe_allow_html=True)
+    st.subheader("🍽️ RSVP & Table Selection")
+    if 'rsvp_info' not in st.session_state:
+        seats_left = sum(get_seating().seats_left().values())
+        st.caption(f"{seats_left:,} seats remaining across {TABLE_COUNT} tables")
+        with st.form("rsvp_form"):
+            meal = st.selectbox("Meal Preference", MEAL_OPTIONS)
+            table = st.number_input(f"Preferred Table Number (1-{TABLE_COUNT})", min_value=1, max_value=TABLE_COUNT, value=1)
+            special = st.text_area("Special Requests (optional)")
+            submit_rsvp = st.form_submit_button("RSVP Now", use_container_width=True)
+            if submit_rsvp:
+                metrics.increment("rsvps_submitted")
+                try:
+                    with metrics.timer("submit_rsvp"):
+                        st.session_state.rsvp_info = get_seating().reserve(
+                            st.session_state.user_email,
+                            st.session_state.user_name,
+                            meal,
+                            int(table),
+                            special
+                        )
+                    st.success("Your RSVP has been received! We look forward to seeing you at the gala.")
+                except SeatingError as e:
+                    alternatives = ", ".join(str(t) for t in e.suggestions)
+                    st.error(f"❌ {e}" + (f" Tables with room: {alternatives}." if alternatives else " No tables have room left."))
+    else:
+        st.markdown(templates.rsvp_card(st.session_state.rsvp_info), unsafe_allow_html=True)
+
+def _history_next_page(cursor):
+    st.session_state.history_cursors.append(cursor)
+
+def _history_previous_page():
+    st.session_state.history_cursors.pop()
+
+@st.fragment
+@metrics.timed("history_section", fragment=True)
+def history_section():
     # Donation History
-    if st.session_state.donation_history:
-        st.header("📊 Your Impact History")
-        st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
-        
-        # Create DataFrame for history
-        df = pd.DataFrame(st.session_state.donation_history)
-        df['organizations'] = df['organizations'].apply(lambda x: ', '.join(x))
-        
+    donor = st.session_state.user_email
+    if get_aggregates().donor(donor)["donation_count"] == 0:
+        return
+    
+    st.header("📊 Your Impact History")
+    st.markdown(templates.SECTION_DIVIDER_HTML, unsafe_allow_html=True)
+    
+    # Sorting and filters are applied by the ledger query, not in memory
+    filter_col1, filter_col2, filter_col3, filter_col4 = st.columns(4)
+    with filter_col1:
+        sort_label = st.selectbox("Sort by", list(HISTORY_SORTS), key="history_sort")
+    with filter_col2:
+        org_filter = st.selectbox("Organization", ["All"] + list(load_catalog()), key="history_org")
+    with filter_col3:
+        frequency_filter = st.selectbox("Donation Type", ["All"] + list(FREQUENCIES), key="history_frequency")
+    with filter_col4:
+        date_range = st.date_input("Date range", value=(), key="history_dates")
+    
+    # Any filter change starts again from the first page
+    filters = (sort_label, org_filter, frequency_filter, tuple(date_range))
+    if st.session_state.get('history_filters') != filters:
+        st.session_state.history_filters = filters
+        st.session_state.history_cursors = [None]
+    cursors = st.session_state.history_cursors
+    
+    # Only the visible page is fetched and sent to the browser
+    with metrics.timer("history_query"):
+        page, next_cursor = get_ledger().history_page(
+            donor,
+            sort=HISTORY_SORTS[sort_label],
+            after=cursors[-1],
+            limit=HISTORY_PAGE_SIZE,
+            organization=None if org_filter == "All" else org_filter,
+            frequency=None if frequency_filter == "All" else frequency_filter,
+            date_from=date_range[0].isoformat() if len(date_range) > 0 else None,
+            date_to=date_range[1].isoformat() if len(date_range) > 1 else None
+        )
+    
+    if page:
         st.dataframe(
-            df,
+            page,
             column_config={
                 "date": "Date",
                 "amount": st.column_config.NumberColumn("Amount ($)", format="$%d"),
@@ -526,19 +629,53 @@ def main_dashboard():
             hide_index=True,
             use_container_width=True
         )
-        
-        # Impact metrics
-        total_impact = sum([d['amount'] for d in st.session_state.donation_history])
+    else:
+        st.write("No donations match these filters.")
+    
+    nav_col1, nav_col2, nav_col3 = st.columns([1, 2, 1])
+    with nav_col1:
+        st.button("← Previous", key="history_prev", disabled=len(cursors) == 1,
+                  on_click=_history_previous_page, use_container_width=True)
+    with nav_col2:
+        st.caption(f"Page {len(cursors)}")
+    with nav_col3:
+        st.button("Next →", key="history_next", disabled=next_cursor is None,
+                  on_click=_history_next_page, args=(next_cursor,), use_container_width=True)
+    
+    # Impact metrics
+    total_impact = current_donor_total()
+    total_pledged = get_aggregates().donor(donor)["pledged"]
+    impact_col1, impact_col2 = st.columns(2)
+    with impact_col1:
         st.metric("Total Impact", f"${total_impact:,}", f"+${total_impact:,} for global education")
+    with impact_col2:
+        st.metric("Total Pledged", f"${total_pledged:,}", "including future installments", delta_color="off")
+    
+    # Tax-year statement from the per-donor yearly rollup, rendered on request
+    # and then served from the cache until its figures change
+    this_year = date.today().year
+    statement_year = st.selectbox("Tax year", [this_year, this_year - 1], key="statement_year")
+    statement = get_ledger().year_statement(donor, statement_year)
+    if statement is None:
+        st.caption(f"No donations recorded for {statement_year}.")
+    else:
+        if st.session_state.get('statement_requested') != statement_year:
+            if st.button(f"📄 Prepare {statement_year} Tax Statement (PDF)", use_container_width=True):
+                st.session_state.statement_requested = statement_year
+        if st.session_state.get('statement_requested') == statement_year:
+            with metrics.timer("statement_render"):
+                pdf_bytes = get_statement_cache().get(statement)
+            st.download_button(
+                label=f"📄 Download {statement_year} Tax Statement (PDF)",
+                data=pdf_bytes,
+                file_name=f"donation_statement_{statement_year}.pdf",
+                mime="application/pdf",
+                use_container_width=True
+            )
 
 # Footer
 st.markdown("---")
-st.markdown("""
-<div style='text-align: center; color: #666;'>
-    <p>🌍 <strong>Global Education Inequality Ball</strong> | Together, we can ensure every child has access to quality education</p>
-    <p>Contact: info@globaleducationball.org | +1 (555) 123-EDUCATION</p>
-</div>
-""", unsafe_allow_html=True)
+st.markdown(templates.FOOTER_HTML, unsafe_allow_html=True)
 
 if __name__ == "__main__":
     main()
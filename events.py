@@ -0,0 +1,105 @@
+import logging
+import threading
+from collections import deque
+
+from ledger import DEFAULT_EVENT
+
+# Live donation feed.
+# One background thread per process tails the ledger (donations after the
+# last id it has seen), so donations made through any worker process are
+# published. Everything found in one poll goes out as a single batch: a burst
+# of donations becomes one subscriber call and one version bump, not one each.
+#
+# Subscribers are callables taking the batch (a list of ledger.donations_after
+# dicts); they run on the feed thread and should only apply deltas. Screens
+# read snapshot(), whose version moves once per published batch, so a viewer
+# that polls it re-renders only when there is something new.
+#
+# A failed poll is logged and retried from the same watermark on the next
+# tick, and a subscriber that raises is logged without holding back the
+# others; the thread itself keeps running for the life of the process.
+
+DEFAULT_POLL_INTERVAL = 0.5
+RECENT_DONATIONS = 10
+
+log = logging.getLogger(__name__)
+
+
+class DonationFeed:
+    def __init__(self, ledger, event=DEFAULT_EVENT, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.ledger = ledger
+        self.event = event
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self._stop = threading.Event()
+        self._poll_lock = threading.Lock()
+        self.watermark = ledger.last_id()
+        summary = ledger.event_summary(event, up_to_id=self.watermark)
+        self._total = summary["total"]
+        self._donation_count = summary["donation_count"]
+        self._tickets = ledger.counters()["tickets"]
+        self._recent = deque(maxlen=RECENT_DONATIONS)
+        self._version = 0
+        self._thread = threading.Thread(target=self._run, name="donation-feed", daemon=True)
+        self._thread.start()
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "version": self._version,
+                "total": self._total,
+                "donation_count": self._donation_count,
+                "tickets": self._tickets,
+                "recent": list(self._recent),
+            }
+
+    def poll(self):
+        # Publish everything recorded since the last poll as one batch.
+        # The watermark only moves once the batch has been published.
+        with self._poll_lock:
+            batch = []
+            watermark = self.watermark
+            while True:
+                donations = self.ledger.donations_after(watermark)
+                if not donations:
+                    break
+                batch.extend(donations)
+                watermark = donations[-1]["id"]
+            if batch:
+                self._publish(batch)
+                self.watermark = watermark
+        return len(batch)
+
+    def _publish(self, batch):
+        # Ledger-wide ticket count, read once per batch.
+        tickets = self.ledger.counters()["tickets"]
+        with self._lock:
+            self._tickets = tickets
+            for donation in batch:
+                if donation["event"] == self.event:
+                    self._total += donation["amount"]
+                    self._donation_count += 1
+                    self._recent.appendleft(donation)
+            self._version += 1
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(batch)
+            except Exception:
+                log.exception("donation feed subscriber %r failed", callback)
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception:
+                log.exception("donation feed poll failed; retrying")
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
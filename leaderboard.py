@@ -0,0 +1,212 @@
+import random
+import threading
+
+from ledger import follows
+
+# Incrementally maintained donor leaderboard.
+# Entries are kept ordered by (-total, donor) in an indexable skip list, so a
+# donation removes the donor's old entry and inserts the new one, and a rank
+# lookup is one search, all in O(log n) expected time. The top N is a walk
+# along the bottom level. One instance is shared by all sessions in the
+# process; sync() applies donations recorded since the last one, including
+# those made through other worker processes.
+
+# Enough levels for 2**32 entries at p = 1/2.
+MAX_LEVELS = 32
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, height):
+        self.key = key
+        self.next = [None] * height
+        # width[level]: positions skipped by next[level] (to the end of the
+        # list when next[level] is None).
+        self.width = [1] * height
+
+
+class _SkipList:
+    # Sorted keys with insert, remove and rank (position) in O(log n)
+    # expected time. Positions are 1-based; the head sits at position 0.
+
+    def __init__(self):
+        self._head = _Node(None, MAX_LEVELS)
+        self._levels = 1
+        self._size = 0
+
+    @staticmethod
+    def _height():
+        height = 1
+        while height < MAX_LEVELS and random.random() < 0.5:
+            height += 1
+        return height
+
+    @classmethod
+    def from_sorted(cls, keys):
+        # Links already sorted keys in one pass instead of n inserts.
+        skiplist = cls()
+        last = [skiplist._head] * MAX_LEVELS
+        last_position = [0] * MAX_LEVELS
+        position = 0
+        for position, key in enumerate(keys, 1):
+            node = _Node(key, cls._height())
+            for level in range(len(node.next)):
+                last[level].next[level] = node
+                last[level].width[level] = position - last_position[level]
+                last[level], last_position[level] = node, position
+            skiplist._levels = max(skiplist._levels, len(node.next))
+        for level in range(skiplist._levels):
+            last[level].width[level] = position + 1 - last_position[level]
+        skiplist._size = position
+        return skiplist
+
+    def _search(self, key):
+        # The last node before `key` on every level, and its position.
+        update = [self._head] * self._levels
+        positions = [0] * self._levels
+        node, position = self._head, 0
+        for level in reversed(range(self._levels)):
+            following = node.next[level]
+            while following is not None and following.key < key:
+                position += node.width[level]
+                node, following = following, following.next[level]
+            update[level], positions[level] = node, position
+        return update, positions
+
+    def insert(self, key):
+        height = self._height()
+        head = self._head
+        for level in range(self._levels, height):
+            head.width[level] = self._size + 1
+        self._levels = max(self._levels, height)
+        update, positions = self._search(key)
+        node = _Node(key, height)
+        position = positions[0] + 1
+        for level in range(height):
+            before = update[level]
+            distance = position - positions[level]
+            node.next[level] = before.next[level]
+            node.width[level] = before.width[level] + 1 - distance
+            before.next[level] = node
+            before.width[level] = distance
+        for level in range(height, self._levels):
+            update[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key):
+        update, _ = self._search(key)
+        node = update[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        for level in range(self._levels):
+            before = update[level]
+            if before.next[level] is node:
+                before.next[level] = node.next[level]
+                before.width[level] += node.width[level] - 1
+            else:
+                before.width[level] -= 1
+        self._size -= 1
+
+    def rank(self, key):
+        # 1-based position of `key`, which must be present.
+        _, positions = self._search(key)
+        return positions[0] + 1
+
+    def first(self, n):
+        keys = []
+        node = self._head.next[0]
+        while node is not None and len(keys) < n:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+    def __len__(self):
+        return self._size
+
+
+class Leaderboard:
+    def __init__(self, ledger=None):
+        # `ledger` lets apply() catch up on donations it was never fed.
+        self.ledger = ledger
+        self._lock = threading.Lock()
+        self._entries = _SkipList()
+        self._totals = {}
+        self._names = {}
+        self._sync_lock = threading.Lock()
+        self.watermark = 0
+
+    @classmethod
+    def from_ledger(cls, ledger):
+        board = cls(ledger)
+        board.watermark, rows = ledger.donor_totals_snapshot()
+        board.load(rows)
+        return board
+
+    def sync(self, ledger):
+        # Catch up on ledger donations after the watermark; returns how many.
+        applied = 0
+        while True:
+            donations = ledger.donations_after(self.watermark)
+            if not donations:
+                return applied
+            applied += self._apply(donations)
+
+    def apply(self, donations):
+        # Record ledger donations (id order) not yet seen; returns how many.
+        # Safe to feed the same donation from both sync() and the live feed.
+        # A batch that skips past the watermark means donations were published
+        # before this board subscribed (or while it was failing); it then
+        # catches up from the ledger, which covers the batch as well.
+        if self.ledger is not None and not follows(self.watermark, donations):
+            return self.sync(self.ledger)
+        return self._apply(donations)
+
+    def _apply(self, donations):
+        applied = 0
+        with self._sync_lock:
+            for donation in donations:
+                if donation["id"] > self.watermark:
+                    self.record(donation["donor"], donation["donor_name"], donation["amount"])
+                    self.watermark = donation["id"]
+                    applied += 1
+        return applied
+
+    def load(self, rows):
+        # Bulk load (donor, donor_name, total) rows; one sort instead of n inserts.
+        with self._lock:
+            for donor, name, total in rows:
+                self._totals[donor] = self._totals.get(donor, 0) + total
+                self._names[donor] = name
+            self._entries = _SkipList.from_sorted(sorted((-total, donor) for donor, total in self._totals.items()))
+
+    def record(self, donor, name, amount):
+        with self._lock:
+            old = self._totals.get(donor)
+            if old is not None:
+                self._entries.remove((-old, donor))
+            total = (old or 0) + amount
+            self._totals[donor] = total
+            self._names[donor] = name
+            self._entries.insert((-total, donor))
+            return total
+
+    def top(self, n=10):
+        with self._lock:
+            return [
+                {"rank": i + 1, "donor": donor, "name": self._names[donor], "total": -neg_total}
+                for i, (neg_total, donor) in enumerate(self._entries.first(n))
+            ]
+
+    def rank(self, donor):
+        with self._lock:
+            total = self._totals.get(donor)
+            if total is None:
+                return None
+            return self._entries.rank((-total, donor))
+
+    def total_for(self, donor):
+        return self._totals.get(donor, 0)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,700 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from splits import split_cents
+
+# Append-only donation ledger backed by SQLite (WAL mode).
+# Donors are keyed by their normalised email address; per-donor running
+# totals are maintained by a trigger so the dashboard never has to scan
+# the full history to answer "how much has this donor given".
+#
+# The database file is the state shared by every app worker process on the
+# host: ledger-wide counters are kept by triggers in the inserting
+# transaction, donations carrying an idempotency key are recorded at most
+# once, and in-process caches catch up on other workers' donations by
+# reading everything after the last id they have seen (donations_after).
+
+DEFAULT_LEDGER_PATH = os.environ.get("DONATE_LEDGER_PATH", "donations.db")
+DEFAULT_BATCH_SIZE = 500
+# Page cache for the writer connection, in KiB; keeps index pages hot during
+# bulk appends.
+WRITER_CACHE_KIB = 65536
+SCHEMA_VERSION = 7
+# Gala that donations are credited to unless a record names another one.
+DEFAULT_EVENT = "ball-2025"
+# Smallest single donation that secures a gala ticket.
+TICKET_MINIMUM = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS donations (
+    id INTEGER PRIMARY KEY,
+    donor TEXT NOT NULL,
+    donor_name TEXT NOT NULL,
+    date TEXT NOT NULL,
+    amount INTEGER NOT NULL CHECK (amount > 0),
+    frequency TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    event TEXT NOT NULL DEFAULT 'ball-2025',
+    idempotency_key TEXT
+);
+
+CREATE TABLE IF NOT EXISTS donation_orgs (
+    donation_id INTEGER NOT NULL REFERENCES donations(id),
+    position INTEGER NOT NULL,
+    organization TEXT NOT NULL,
+    amount_cents INTEGER,
+    PRIMARY KEY (donation_id, position)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS donor_totals (
+    donor TEXT PRIMARY KEY,
+    donor_name TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    donation_count INTEGER NOT NULL,
+    max_amount INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS ledger_counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS donor_year_totals (
+    year INTEGER NOT NULL,
+    donor TEXT NOT NULL,
+    donor_name TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    donation_count INTEGER NOT NULL,
+    PRIMARY KEY (year, donor)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS donor_year_orgs (
+    year INTEGER NOT NULL,
+    donor TEXT NOT NULL,
+    organization TEXT NOT NULL,
+    amount_cents INTEGER NOT NULL,
+    PRIMARY KEY (year, donor, organization)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_donations_donor_date ON donations(donor, date, id);
+CREATE INDEX IF NOT EXISTS idx_donations_donor_amount ON donations(donor, amount, id);
+CREATE INDEX IF NOT EXISTS idx_donations_date ON donations(date, id);
+CREATE INDEX IF NOT EXISTS idx_donations_frequency_date ON donations(frequency, date, id);
+CREATE INDEX IF NOT EXISTS idx_donations_event ON donations(event, amount);
+CREATE INDEX IF NOT EXISTS idx_donation_orgs_org ON donation_orgs(organization, donation_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_donations_idempotency ON donations(idempotency_key)
+    WHERE idempotency_key IS NOT NULL;
+
+CREATE TRIGGER IF NOT EXISTS donations_no_update BEFORE UPDATE ON donations
+BEGIN
+    SELECT RAISE(ABORT, 'donation ledger is append-only');
+END;
+
+CREATE TRIGGER IF NOT EXISTS donations_no_delete BEFORE DELETE ON donations
+BEGIN
+    SELECT RAISE(ABORT, 'donation ledger is append-only');
+END;
+
+CREATE TRIGGER IF NOT EXISTS donations_rollup AFTER INSERT ON donations
+BEGIN
+    INSERT INTO donor_totals (donor, donor_name, total, donation_count, max_amount)
+    VALUES (NEW.donor, NEW.donor_name, NEW.amount, 1, NEW.amount)
+    ON CONFLICT (donor) DO UPDATE SET
+        donor_name = excluded.donor_name,
+        total = total + excluded.total,
+        donation_count = donation_count + 1,
+        max_amount = max(max_amount, excluded.max_amount);
+END;
+
+CREATE TRIGGER IF NOT EXISTS donations_counters AFTER INSERT ON donations
+BEGIN
+    INSERT INTO ledger_counters (name, value) VALUES ('donations', 1), ('dollars', NEW.amount)
+    ON CONFLICT (name) DO UPDATE SET value = value + excluded.value;
+END;
+
+CREATE TRIGGER IF NOT EXISTS donations_year_rollup AFTER INSERT ON donations
+BEGIN
+    INSERT INTO donor_year_totals (year, donor, donor_name, total, donation_count)
+    VALUES (CAST(substr(NEW.date, 1, 4) AS INTEGER), NEW.donor, NEW.donor_name, NEW.amount, 1)
+    ON CONFLICT (year, donor) DO UPDATE SET
+        donor_name = excluded.donor_name,
+        total = total + excluded.total,
+        donation_count = donation_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS donation_orgs_year_rollup AFTER INSERT ON donation_orgs
+BEGIN
+    INSERT INTO donor_year_orgs (year, donor, organization, amount_cents)
+    SELECT CAST(substr(date, 1, 4) AS INTEGER), donor, NEW.organization, COALESCE(NEW.amount_cents, 0)
+    FROM donations WHERE id = NEW.donation_id
+    ON CONFLICT (year, donor, organization) DO UPDATE SET amount_cents = amount_cents + excluded.amount_cents;
+END;
+
+CREATE TRIGGER IF NOT EXISTS donations_ticket_counter AFTER INSERT ON donations
+WHEN NEW.amount >= 5000 AND NOT EXISTS (
+    SELECT 1 FROM donations WHERE donor = NEW.donor AND amount >= 5000 AND id <> NEW.id
+)
+BEGIN
+    INSERT INTO ledger_counters (name, value) VALUES ('tickets', 1)
+    ON CONFLICT (name) DO UPDATE SET value = value + 1;
+END;
+"""
+
+# Rows fetched per round trip by migration backfills.
+BACKFILL_CHUNK = 1000
+
+
+def _backfill_org_cents(conn):
+    # Fills in donation_orgs.amount_cents for donations recorded before it
+    # existed. Those donations were split evenly, which is also how a record
+    # without allocations is split today.
+    after = 0
+    while True:
+        rows = conn.execute(
+            "SELECT d.id, d.amount, o.position FROM donations d JOIN donation_orgs o ON o.donation_id = d.id "
+            "WHERE d.id IN (SELECT donation_id FROM donation_orgs WHERE amount_cents IS NULL AND donation_id > ? "
+            "ORDER BY donation_id LIMIT ?) "
+            "ORDER BY d.id, o.position",
+            (after, BACKFILL_CHUNK),
+        ).fetchall()
+        if not rows:
+            return
+        donations = {}
+        for donation_id, amount, position in rows:
+            donations.setdefault((donation_id, amount), []).append(position)
+        conn.executemany(
+            "UPDATE donation_orgs SET amount_cents = ? WHERE donation_id = ? AND position = ?",
+            [
+                (cents, donation_id, position)
+                for (donation_id, amount), positions in donations.items()
+                for position, cents in zip(positions, split_cents(amount * 100, [1] * len(positions)))
+            ],
+        )
+        after = rows[-1][0]
+
+
+# Upgrades for ledgers created by older versions, keyed by the version they
+# bring the database to. Each is an SQL script or a tuple of scripts and
+# functions taking the connection, all run in the upgrade transaction.
+MIGRATIONS = {
+    2: (
+        "ALTER TABLE donation_orgs ADD COLUMN amount_cents INTEGER;",
+        _backfill_org_cents,
+    ),
+    3: "ALTER TABLE donations ADD COLUMN event TEXT NOT NULL DEFAULT 'ball-2025';",
+    4: """
+        ALTER TABLE donations ADD COLUMN idempotency_key TEXT;
+        CREATE TABLE ledger_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL) WITHOUT ROWID;
+        INSERT INTO ledger_counters (name, value)
+            SELECT 'donations', COUNT(*) FROM donations
+            UNION ALL SELECT 'dollars', COALESCE(SUM(amount), 0) FROM donations
+            UNION ALL SELECT 'tickets', COUNT(*) FROM donor_totals WHERE max_amount >= 5000;
+    """,
+    5: """
+        CREATE TABLE donor_year_totals (
+            year INTEGER NOT NULL, donor TEXT NOT NULL, donor_name TEXT NOT NULL,
+            total INTEGER NOT NULL, donation_count INTEGER NOT NULL, PRIMARY KEY (year, donor)
+        ) WITHOUT ROWID;
+        CREATE TABLE donor_year_orgs (
+            year INTEGER NOT NULL, donor TEXT NOT NULL, organization TEXT NOT NULL,
+            amount_cents INTEGER NOT NULL, PRIMARY KEY (year, donor, organization)
+        ) WITHOUT ROWID;
+        -- donor_name comes from the donor's latest donation in the year (max(id) row).
+        INSERT INTO donor_year_totals (year, donor, donor_name, total, donation_count)
+            SELECT year, donor, donor_name, total, donation_count FROM (
+                SELECT CAST(substr(date, 1, 4) AS INTEGER) AS year, donor, donor_name, MAX(id),
+                       SUM(amount) AS total, COUNT(*) AS donation_count
+                FROM donations GROUP BY year, donor
+            );
+        INSERT INTO donor_year_orgs (year, donor, organization, amount_cents)
+            SELECT CAST(substr(d.date, 1, 4) AS INTEGER), d.donor, o.organization, SUM(COALESCE(o.amount_cents, 0))
+            FROM donation_orgs o JOIN donations d ON d.id = o.donation_id
+            GROUP BY 1, 2, 3;
+    """,
+    # Ledgers upgraded past v2 before it backfilled amount_cents: fill the
+    # gaps and rebuild the per-organization yearly rollup from them.
+    6: (
+        _backfill_org_cents,
+        """
+        DELETE FROM donor_year_orgs;
+        INSERT INTO donor_year_orgs (year, donor, organization, amount_cents)
+            SELECT CAST(substr(d.date, 1, 4) AS INTEGER), d.donor, o.organization, SUM(o.amount_cents)
+            FROM donation_orgs o JOIN donations d ON d.id = o.donation_id
+            GROUP BY 1, 2, 3;
+        """,
+    ),
+    # Per-frequency date scans for schedule projections.
+    7: "CREATE INDEX idx_donations_frequency_date ON donations(frequency, date, id);",
+}
+
+COUNTERS = ("donations", "dollars", "tickets")
+
+# History page sort orders: column plus direction. Pagination is keyset-based
+# on (column, id), so each page is an index range scan however deep it is.
+HISTORY_SORTS = {
+    "date_desc": ("date", True),
+    "date_asc": ("date", False),
+    "amount_desc": ("amount", True),
+    "amount_asc": ("amount", False),
+}
+
+# Separator used to pack a donation's organizations into one column on read.
+_ORG_SEP = "\x1f"
+
+
+def normalize_donor(email):
+    return email.strip().lower()
+
+
+def follows(watermark, donations):
+    # True if `donations` (donations_after() dicts in id order) pick up right
+    # after `watermark` without skipping an id. Ledger ids are handed out
+    # without gaps, so a skipped id is a donation the reader never saw.
+    expected = watermark + 1
+    for donation in donations:
+        if donation["id"] > expected:
+            return False
+        expected = max(expected, donation["id"] + 1)
+    return True
+
+
+def _statements(script):
+    # Splits a script into single statements (trigger bodies included) to run
+    # inside a transaction; executescript() would commit it first.
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement.strip()
+            statement = ""
+
+
+def _upgrade(conn, target):
+    # Applies MIGRATIONS[target] and records the new version, inside the
+    # caller's transaction.
+    steps = MIGRATIONS[target]
+    for step in steps if isinstance(steps, tuple) else (steps,):
+        if callable(step):
+            step(conn)
+            continue
+        for statement in _statements(step):
+            conn.execute(statement)
+    conn.execute(f"PRAGMA user_version = {target}")
+
+
+class DonationLedger:
+    def __init__(self, path=DEFAULT_LEDGER_PATH, batch_size=DEFAULT_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        self._writer = self._connect()
+        self._writer.execute(f"PRAGMA cache_size = -{WRITER_CACHE_KIB}")
+        self._migrate()
+
+    def _connect(self):
+        # Other worker processes may hold the write lock; wait rather than fail.
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def _migrate(self):
+        # Every worker process runs this on startup. The whole upgrade is one
+        # IMMEDIATE transaction and the version is re-read once the write
+        # lock is held, so exactly one process upgrades and a crash leaves
+        # the previous version intact.
+        conn = self._writer
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < SCHEMA_VERSION:
+                exists = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'donations'"
+                ).fetchone()
+                if exists:
+                    for target in range(max(version, 1) + 1, SCHEMA_VERSION + 1):
+                        _upgrade(conn, target)
+                for statement in _statements(SCHEMA):
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _reader(self):
+        # One read connection per thread; WAL lets readers run alongside the writer.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    # Writes
+
+    def add(self, record):
+        # Append a single record and commit it so it is immediately visible to
+        # readers; returns its id.
+        with self._write_lock:
+            return self._write_batch([record])[-1]
+
+    def append_many(self, records, batch_size=None):
+        batch_size = batch_size or self.batch_size
+        count = 0
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                with self._write_lock:
+                    self._write_batch(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            with self._write_lock:
+                self._write_batch(batch)
+            count += len(batch)
+        return count
+
+    def _write_batch(self, batch):
+        conn = self._writer
+        created_at = datetime.now().isoformat(timespec="seconds")
+        ids = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for record in batch:
+                key = record.get("idempotency_key")
+                row = conn.execute(
+                    "INSERT INTO donations (donor, donor_name, date, amount, frequency, created_at, event, idempotency_key) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (idempotency_key) WHERE idempotency_key IS NOT NULL DO NOTHING "
+                    "RETURNING id",
+                    (
+                        normalize_donor(record["donor"]),
+                        record.get("donor_name") or record["donor"],
+                        record["date"],
+                        int(record["amount"]),
+                        record["frequency"],
+                        created_at,
+                        record.get("event", DEFAULT_EVENT),
+                        key,
+                    ),
+                ).fetchone()
+                if row is None:
+                    # Already recorded (by this or another worker); keep the original.
+                    ids.append(conn.execute(
+                        "SELECT id FROM donations WHERE idempotency_key = ?", (key,)
+                    ).fetchone()[0])
+                    continue
+                donation_id = row[0]
+                organizations = record["organizations"]
+                # Per-organization shares in cents; even split unless the caller
+                # already allocated the donation.
+                allocations = record.get("allocations")
+                if allocations is None:
+                    allocations = split_cents(int(record["amount"]) * 100, [1] * len(organizations))
+                conn.executemany(
+                    "INSERT INTO donation_orgs (donation_id, position, organization, amount_cents) "
+                    "VALUES (?, ?, ?, ?)",
+                    [
+                        (donation_id, i, org, int(cents))
+                        for i, (org, cents) in enumerate(zip(organizations, allocations))
+                    ],
+                )
+                ids.append(donation_id)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return ids
+
+    # Reads
+
+    def donor_summary(self, donor):
+        row = self._reader().execute(
+            "SELECT donor_name, total, donation_count, max_amount FROM donor_totals WHERE donor = ?",
+            (normalize_donor(donor),),
+        ).fetchone()
+        if row is None:
+            return None
+        return {"donor_name": row[0], "total": row[1], "donation_count": row[2], "max_amount": row[3]}
+
+    def donor_totals_snapshot(self):
+        # (last donation id, [(donor, donor_name, total), ...]) read in one
+        # transaction, so a cache seeded from the rows can catch up from the id.
+        conn = self._reader()
+        conn.execute("BEGIN")
+        try:
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM donations").fetchone()[0]
+            rows = conn.execute("SELECT donor, donor_name, total FROM donor_totals").fetchall()
+        finally:
+            conn.execute("COMMIT")
+        return last_id, rows
+
+    def last_id(self):
+        return self._reader().execute("SELECT COALESCE(MAX(id), 0) FROM donations").fetchone()[0]
+
+    def donations_after(self, after_id, limit=1000):
+        # Donations with id > after_id in id order, at most `limit` of them.
+        rows = self._reader().execute(
+            "SELECT d.id, d.donor, d.donor_name, d.amount, d.event, "
+            "(SELECT group_concat(organization, ?) FROM "
+            "(SELECT organization FROM donation_orgs WHERE donation_id = d.id ORDER BY position)) "
+            "FROM donations d WHERE d.id > ? ORDER BY d.id LIMIT ?",
+            (_ORG_SEP, after_id, limit),
+        )
+        return [
+            {
+                "id": donation_id,
+                "donor": donor,
+                "donor_name": donor_name,
+                "amount": amount,
+                "event": event,
+                "organizations": orgs.split(_ORG_SEP) if orgs else [],
+            }
+            for donation_id, donor, donor_name, amount, event, orgs in rows
+        ]
+
+    def counters(self):
+        # Ledger-wide donation count, dollars and ticket holders, kept current
+        # by triggers and so identical for every worker process.
+        values = dict.fromkeys(COUNTERS, 0)
+        values.update(self._reader().execute("SELECT name, value FROM ledger_counters"))
+        return values
+
+    def history_page(self, donor, sort="date_desc", after=None, limit=25,
+                     organization=None, frequency=None, date_from=None, date_to=None):
+        # One page of a donor's history. `after` is the cursor returned with
+        # the previous page; returns (rows, next_cursor or None).
+        column, descending = HISTORY_SORTS[sort]
+        where = ["d.donor = ?"]
+        params = [normalize_donor(donor)]
+        if frequency:
+            where.append("d.frequency = ?")
+            params.append(frequency)
+        if date_from:
+            where.append("d.date >= ?")
+            params.append(date_from)
+        if date_to:
+            where.append("d.date <= ?")
+            params.append(date_to)
+        if organization:
+            where.append("EXISTS (SELECT 1 FROM donation_orgs o WHERE o.donation_id = d.id AND o.organization = ?)")
+            params.append(organization)
+        if after is not None:
+            where.append(f"(d.{column}, d.id) {'<' if descending else '>'} (?, ?)")
+            params.extend(after)
+        direction = "DESC" if descending else "ASC"
+        sql = (
+            f"SELECT d.id, d.{column}, d.date, d.amount, "
+            "(SELECT group_concat(organization, ', ') FROM "
+            "(SELECT organization FROM donation_orgs WHERE donation_id = d.id ORDER BY position)), "
+            "d.frequency "
+            f"FROM donations d WHERE {' AND '.join(where)} "
+            f"ORDER BY d.{column} {direction}, d.id {direction} LIMIT ?"
+        )
+        params.append(limit + 1)
+        rows = self._reader().execute(sql, params).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1][1], rows[-1][0])
+        page = [
+            {"date": day, "amount": amount, "organizations": orgs or "", "frequency": freq}
+            for _, _, day, amount, orgs, freq in rows
+        ]
+        return page, next_cursor
+
+    def iter_year_statements(self, year):
+        # One consolidated statement per donor who gave in `year`, in donor
+        # order, read from the per-donor yearly rollups (never the ledger).
+        rows = self._reader().execute(
+            "SELECT t.donor, t.donor_name, t.total, t.donation_count, o.organization, o.amount_cents "
+            "FROM donor_year_totals t LEFT JOIN donor_year_orgs o ON o.year = t.year AND o.donor = t.donor "
+            "WHERE t.year = ? ORDER BY t.donor, o.amount_cents DESC, o.organization",
+            (year,),
+        )
+        statement = None
+        for donor, donor_name, total, donation_count, organization, cents in rows:
+            if statement is None or statement["donor"] != donor:
+                if statement is not None:
+                    yield statement
+                statement = {
+                    "donor": donor,
+                    "donor_name": donor_name,
+                    "year": year,
+                    "total": total,
+                    "donation_count": donation_count,
+                    "organizations": [],
+                }
+            if organization is not None:
+                statement["organizations"].append((organization, cents))
+        if statement is not None:
+            yield statement
+
+    def year_statement(self, donor, year):
+        row = self._reader().execute(
+            "SELECT donor_name, total, donation_count FROM donor_year_totals WHERE year = ? AND donor = ?",
+            (year, normalize_donor(donor)),
+        ).fetchone()
+        if row is None:
+            return None
+        organizations = self._reader().execute(
+            "SELECT organization, amount_cents FROM donor_year_orgs WHERE year = ? AND donor = ? "
+            "ORDER BY amount_cents DESC, organization",
+            (year, normalize_donor(donor)),
+        ).fetchall()
+        return {
+            "donor": normalize_donor(donor),
+            "donor_name": row[0],
+            "year": year,
+            "total": row[1],
+            "donation_count": row[2],
+            "organizations": organizations,
+        }
+
+    def iter_year_donations(self, year):
+        # Stream every donation dated in `year`, grouped by donor.
+        rows = self._reader().execute(
+            "SELECT d.donor, d.donor_name, d.date, d.amount, "
+            "(SELECT group_concat(organization, ?) FROM "
+            "(SELECT organization FROM donation_orgs WHERE donation_id = d.id ORDER BY position)), "
+            "d.frequency "
+            "FROM donations d WHERE d.date >= ? AND d.date < ? ORDER BY d.donor, d.date, d.id",
+            (_ORG_SEP, f"{year:04d}-01-01", f"{year + 1:04d}-01-01"),
+        )
+        for row in rows:
+            record = _history_row(row[2:])
+            record["donor"] = row[0]
+            record["donor_name"] = row[1]
+            yield record
+
+    def iter_donations_between(self, start, end, frequency=None):
+        # Stream donations dated in [start, end] (ISO dates) in date order,
+        # optionally only those of one `frequency`.
+        if frequency is None:
+            rows = self._reader().execute(
+                "SELECT donor, donor_name, date, amount, frequency FROM donations "
+                "WHERE date >= ? AND date <= ? ORDER BY date, id",
+                (start, end),
+            )
+        else:
+            rows = self._reader().execute(
+                "SELECT donor, donor_name, date, amount, frequency FROM donations "
+                "WHERE frequency = ? AND date >= ? AND date <= ? ORDER BY date, id",
+                (frequency, start, end),
+            )
+        for donor, donor_name, day, amount, frequency in rows:
+            yield {"donor": donor, "donor_name": donor_name, "date": day, "amount": amount, "frequency": frequency}
+
+    def donor_amounts_by_frequency(self, donor):
+        rows = self._reader().execute(
+            "SELECT frequency, SUM(amount) FROM donations WHERE donor = ? GROUP BY frequency",
+            (normalize_donor(donor),),
+        )
+        return dict(rows.fetchall())
+
+    def event_summary(self, event=DEFAULT_EVENT, up_to_id=None):
+        # `up_to_id` counts only donations with id <= it, to pair the totals
+        # with a watermark for donations_after().
+        sql = "SELECT COALESCE(SUM(amount), 0), COUNT(*) FROM donations WHERE event = ?"
+        params = [event]
+        if up_to_id is not None:
+            sql += " AND id <= ?"
+            params.append(up_to_id)
+        row = self._reader().execute(sql, params).fetchone()
+        return {"total": row[0], "donation_count": row[1]}
+
+    def org_summary(self, organization):
+        row = self._reader().execute(
+            "SELECT COALESCE(SUM(amount_cents), 0), COUNT(*) FROM donation_orgs WHERE organization = ?",
+            (organization,),
+        ).fetchone()
+        return {"total_cents": row[0], "donation_count": row[1]}
+
+    def iter_export_chunks(self, chunk_size, date_from=None, date_to=None, donor=None,
+                           organization=None, event=None):
+        # Filtered ledger rows in id order, `chunk_size` at a time (keyset
+        # pagination on id, so memory stays bounded on any ledger size). Each
+        # row is (donor, donor_name, date, amount, organizations, frequency,
+        # event) with organizations joined by ';'.
+        where = ["d.id > ?"]
+        params = []
+        if date_from:
+            where.append("d.date >= ?")
+            params.append(date_from)
+        if date_to:
+            where.append("d.date <= ?")
+            params.append(date_to)
+        if donor:
+            where.append("d.donor = ?")
+            params.append(normalize_donor(donor))
+        if event:
+            where.append("d.event = ?")
+            params.append(event)
+        if organization:
+            where.append("EXISTS (SELECT 1 FROM donation_orgs o WHERE o.donation_id = d.id AND o.organization = ?)")
+            params.append(organization)
+        sql = (
+            "SELECT d.id, d.donor, d.donor_name, d.date, d.amount, "
+            "(SELECT group_concat(organization, ';') FROM "
+            "(SELECT organization FROM donation_orgs WHERE donation_id = d.id ORDER BY position)), "
+            "d.frequency, d.event "
+            f"FROM donations d WHERE {' AND '.join(where)} ORDER BY d.id LIMIT ?"
+        )
+        conn = self._reader()
+        last_id = 0
+        while True:
+            rows = conn.execute(sql, [last_id, *params, chunk_size]).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [row[1:] for row in rows]
+
+    def org_payouts(self):
+        # Organization -> cents allocated to it across the whole ledger.
+        rows = self._reader().execute(
+            "SELECT organization, SUM(amount_cents) FROM donation_orgs GROUP BY organization"
+        )
+        return {org: cents or 0 for org, cents in rows}
+
+    def iter_split_chunks(self, chunk_size):
+        # (donation_id, amount, organization) rows in donation/position order,
+        # in chunks that never split a donation across two chunks.
+        conn = self._reader()
+        last_id = 0
+        while True:
+            bound = conn.execute(
+                "SELECT max(id) FROM (SELECT id FROM donations WHERE id > ? ORDER BY id LIMIT ?)",
+                (last_id, chunk_size),
+            ).fetchone()[0]
+            if bound is None:
+                return
+            yield conn.execute(
+                "SELECT d.id, d.amount, o.organization FROM donations d "
+                "JOIN donation_orgs o ON o.donation_id = d.id "
+                "WHERE d.id > ? AND d.id <= ? ORDER BY d.id, o.position",
+                (last_id, bound),
+            ).fetchall()
+            last_id = bound
+
+    def close(self):
+        self._writer.close()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def _history_row(row):
+    return {
+        "date": row[0],
+        "amount": row[1],
+        "organizations": row[2].split(_ORG_SEP) if row[2] else [],
+        "frequency": row[3],
+    }
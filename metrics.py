@@ -0,0 +1,258 @@
+import atexit
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from functools import wraps
+
+# Lightweight hot-path instrumentation.
+# Set DONATE_METRICS=1 to enable. Timers feed Prometheus-style histograms,
+# reruns (full and fragment) are counted per session, and everything is
+# exported in the Prometheus text format via
+#   DONATE_METRICS_PORT=9464          HTTP endpoint at /metrics
+#   DONATE_METRICS_FILE=metrics.prom  file rewritten every DONATE_METRICS_INTERVAL s
+# Every worker process exports its own registry. The endpoint binds
+# DONATE_METRICS_HOST (127.0.0.1 unless set) on the first free port of
+# DONATE_METRICS_PORT .. +DONATE_METRICS_PORTS-1, so scrape that range. The
+# file gets the process id inserted (metrics.<pid>.prom) and is removed at
+# exit. Every series carries a pid label, so the files can be collected side
+# by side.
+# When disabled, timer() hands back a shared no-op context manager and
+# timed() returns the function unchanged, so instrumentation costs nothing.
+
+ENABLED = os.environ.get("DONATE_METRICS", "").lower() in ("1", "true", "yes")
+METRICS_HOST = os.environ.get("DONATE_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = os.environ.get("DONATE_METRICS_PORT")
+METRICS_PORTS = int(os.environ.get("DONATE_METRICS_PORTS", "16"))
+METRICS_FILE = os.environ.get("DONATE_METRICS_FILE")
+FLUSH_INTERVAL = float(os.environ.get("DONATE_METRICS_INTERVAL", "15"))
+
+# Seconds. Buckets are upper bounds; +Inf is implicit.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RERUN_COUNT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500)
+# A session counts as active if it reran within this many seconds.
+ACTIVE_WINDOW = 300
+_NULL_TIMER = nullcontext()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def render(self, name, labels=""):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}le="+Inf"}} {self.count}')
+        suffix = f"{{{labels.rstrip(',')}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.total}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timers = {}
+        self._counters = {}
+        self._sessions = {}
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self._timers.get(name)
+            if histogram is None:
+                histogram = self._timers[name] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(seconds)
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def record_rerun(self, session_id, fragment=False):
+        now = time.monotonic()
+        counter = "fragment_reruns" if fragment else "reruns"
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + 1
+            count, _ = self._sessions.get(session_id, (0, now))
+            self._sessions[session_id] = (count + 1, now)
+
+    def _prune_sessions(self, now):
+        cutoff = now - ACTIVE_WINDOW
+        for session_id in [s for s, (_, seen) in self._sessions.items() if seen < cutoff]:
+            del self._sessions[session_id]
+
+    def render(self):
+        pid = f'pid="{os.getpid()}",'
+        with self._lock:
+            self._prune_sessions(time.monotonic())
+            lines = [
+                "# HELP donate_timer_seconds Time spent in instrumented sections and handlers.",
+                "# TYPE donate_timer_seconds histogram",
+            ]
+            for name in sorted(self._timers):
+                lines.extend(self._timers[name].render("donate_timer_seconds", f'{pid}name="{name}",'))
+            for name in sorted(self._counters):
+                lines.append(f"# TYPE donate_{name}_total counter")
+                lines.append(f"donate_{name}_total{{{pid.rstrip(',')}}} {self._counters[name]}")
+            lines.append("# HELP donate_active_sessions Sessions that reran in the last 5 minutes.")
+            lines.append("# TYPE donate_active_sessions gauge")
+            lines.append(f"donate_active_sessions{{{pid.rstrip(',')}}} {len(self._sessions)}")
+            per_session = Histogram(RERUN_COUNT_BUCKETS)
+            for count, _ in self._sessions.values():
+                per_session.observe(count)
+            lines.append("# HELP donate_session_reruns Reruns (full and fragment) so far per active session.")
+            lines.append("# TYPE donate_session_reruns histogram")
+            lines.extend(per_session.render("donate_session_reruns", pid))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        registry.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def timer(name):
+    if not ENABLED:
+        return _NULL_TIMER
+    return _Timer(name)
+
+
+def timed(name, fragment=False):
+    # fragment=True for st.fragment functions: a run of the fragment on its
+    # own (not as part of a full rerun) is also counted as a rerun.
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if fragment:
+                session_id, fragment_run = _script_run()
+                if fragment_run:
+                    registry.record_rerun(session_id, fragment=True)
+            with _Timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def increment(name, amount=1):
+    if ENABLED:
+        registry.increment(name, amount)
+
+
+def _script_run():
+    # (session id, whether only fragments are running) for the current
+    # Streamlit script run.
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return "bare", False
+    return ctx.session_id, bool(ctx.fragment_ids_this_run)
+
+
+def record_rerun():
+    # Call at the top of the script: counts a full rerun of this session.
+    if ENABLED:
+        registry.record_rerun(_script_run()[0])
+
+
+# Exporters
+
+_exporters_lock = threading.Lock()
+_exporters_started = False
+# Port the HTTP endpoint bound in this process, once started.
+bound_port = None
+
+
+def _process_path(path):
+    root, ext = os.path.splitext(path)
+    return f"{root}.{os.getpid()}{ext}"
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _flush_loop(path, interval):
+    while True:
+        time.sleep(interval)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(registry.render())
+        os.replace(tmp_path, path)
+
+
+def _bind(host, first_port, ports):
+    # A server on the first free port of first_port .. first_port+ports-1.
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    for port in range(first_port, first_port + ports):
+        try:
+            return ThreadingHTTPServer((host, port), MetricsHandler)
+        except OSError:
+            continue
+    raise OSError(f"no free metrics port in {first_port}-{first_port + ports - 1}")
+
+
+def start_exporters():
+    # Idempotent; safe to call on every rerun.
+    global _exporters_started, bound_port
+    if not ENABLED or _exporters_started:
+        return
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        if METRICS_FILE:
+            path = _process_path(METRICS_FILE)
+            atexit.register(_remove, path)
+            threading.Thread(target=_flush_loop, args=(path, FLUSH_INTERVAL),
+                             name="metrics-flush", daemon=True).start()
+        if METRICS_PORT:
+            server = _bind(METRICS_HOST, int(METRICS_PORT), METRICS_PORTS)
+            bound_port = server.server_address[1]
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        _exporters_started = True
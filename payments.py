@@ -0,0 +1,184 @@
+import asyncio
+import importlib
+import logging
+import os
+import random
+import threading
+import uuid
+from collections import OrderedDict
+
+# Asynchronous payment pipeline.
+# The donation form only enqueues a payment under an idempotency key and
+# returns; an asyncio event loop running in a background thread charges the
+# gateway and records successful donations. Resubmitting the same key (double
+# click, rerun mid-submit) returns the existing status instead of charging again.
+#
+# A charged payment stays CHARGED until on_success (the ledger write) has
+# gone through: failed writes are logged and retried with the same payment,
+# idempotency key included, so a write that did land is not recorded twice.
+# After MAX_RECORD_ATTEMPTS failures the payment is UNRECORDED: the donor is
+# told, an error with everything needed to record it by hand is logged, and
+# the status is kept for as long as the process runs.
+
+PENDING = "pending"
+CHARGED = "charged"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+UNRECORDED = "unrecorded"
+UNSETTLED = (PENDING, CHARGED)
+
+DEFAULT_CONCURRENCY = 64
+DEFAULT_MAX_TRACKED = 100_000
+# Seconds between attempts to record a charged payment; the last delay
+# repeats. Ten attempts span a little over two minutes.
+RECORD_RETRY_DELAYS = (1, 2, 5, 10, 30)
+MAX_RECORD_ATTEMPTS = 10
+
+log = logging.getLogger(__name__)
+
+
+class PaymentError(Exception):
+    pass
+
+
+class MockPaymentGateway:
+    # Local stand-in for a card processor: sleeps for `latency` seconds and
+    # declines a `fail_rate` fraction of charges.
+
+    def __init__(self, latency=0.5, fail_rate=0.0, seed=None):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self._random = random.Random(seed)
+
+    async def charge(self, payment):
+        await asyncio.sleep(self.latency)
+        if self._random.random() < self.fail_rate:
+            raise PaymentError("Card declined by issuer")
+        return f"mock_{uuid.uuid4().hex[:16]}"
+
+
+def gateway_from_env():
+    # DONATE_PAYMENT_GATEWAY="package.module:ClassName" selects a real gateway;
+    # the mock gateway is used when it is unset.
+    spec = os.environ.get("DONATE_PAYMENT_GATEWAY")
+    if not spec:
+        return MockPaymentGateway()
+    module_name, _, class_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+def new_idempotency_key():
+    return uuid.uuid4().hex
+
+
+class PaymentPipeline:
+    def __init__(self, gateway, on_success=None, concurrency=DEFAULT_CONCURRENCY, max_tracked=DEFAULT_MAX_TRACKED):
+        self.gateway = gateway
+        self.on_success = on_success
+        self.concurrency = concurrency
+        self.max_tracked = max_tracked
+        self._lock = threading.Lock()
+        self._statuses = OrderedDict()
+        self._loop = asyncio.new_event_loop()
+        self._queue = None
+        self._workers = []
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, name="payment-pipeline", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue()
+        self._workers = [self._loop.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.close()
+
+    async def _worker(self):
+        while True:
+            key, payment = await self._queue.get()
+            try:
+                try:
+                    transaction_id = await self.gateway.charge(payment)
+                except Exception as exc:
+                    self._set_status(key, FAILED, error=str(exc))
+                    continue
+                self._set_status(key, CHARGED, transaction_id=transaction_id)
+                if self.on_success is not None and not await self._record(key, payment):
+                    self._set_status(key, UNRECORDED)
+                    log.error(
+                        "payment %s charged (transaction %s) but not recorded after %d attempts; "
+                        "record it by hand: donor=%s amount=%s date=%s organizations=%s",
+                        key, transaction_id, MAX_RECORD_ATTEMPTS, payment.get("donor"), payment.get("amount"),
+                        payment.get("date"), payment.get("organizations"),
+                    )
+                    continue
+                self._set_status(key, SUCCEEDED)
+            finally:
+                self._queue.task_done()
+
+    async def _record(self, key, payment):
+        # True once on_success has gone through, False after
+        # MAX_RECORD_ATTEMPTS failed attempts.
+        for attempt in range(1, MAX_RECORD_ATTEMPTS + 1):
+            try:
+                # Recording touches SQLite; keep it off the event loop.
+                await self._loop.run_in_executor(None, self.on_success, payment)
+                return True
+            except Exception as exc:
+                log.warning("recording payment %s failed (attempt %d of %d): %s", key, attempt, MAX_RECORD_ATTEMPTS, exc)
+                self._set_status(key, CHARGED, error=str(exc), record_attempts=attempt)
+                if attempt < MAX_RECORD_ATTEMPTS:
+                    await asyncio.sleep(RECORD_RETRY_DELAYS[min(attempt, len(RECORD_RETRY_DELAYS)) - 1])
+        return False
+
+    def _set_status(self, key, state, **fields):
+        with self._lock:
+            status = self._statuses.get(key)
+            if status is not None:
+                status.update(state=state, **fields)
+
+    def submit(self, key, payment):
+        # Enqueue `payment` under `key` unless that key has been seen already.
+        # The payment is recorded with `key` as its idempotency key.
+        payment = dict(payment, idempotency_key=key)
+        with self._lock:
+            status = self._statuses.get(key)
+            if status is not None:
+                return dict(status)
+            status = {"state": PENDING, "payment": payment}
+            self._statuses[key] = status
+            self._forget_settled(len(self._statuses) - self.max_tracked)
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (key, payment))
+        return dict(status)
+
+    def _forget_settled(self, count):
+        # Drops the `count` oldest settled statuses. Unsettled and unrecorded
+        # payments are never dropped, so a session waiting on one always
+        # finds it.
+        if count <= 0:
+            return
+        settled = []
+        for key, status in self._statuses.items():
+            if status["state"] not in UNSETTLED and status["state"] != UNRECORDED:
+                settled.append(key)
+                if len(settled) == count:
+                    break
+        for key in settled:
+            del self._statuses[key]
+
+    def status(self, key):
+        with self._lock:
+            status = self._statuses.get(key)
+            return dict(status) if status is not None else None
+
+    async def _shutdown(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._loop.stop()
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop)
+        self._thread.join()
@@ -0,0 +1,172 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import zipfile
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+
+# PDF receipt rendering.
+# Single receipts are cached by a content hash of the donation record so a
+# rerun never renders the same receipt twice (the same cache, given another
+# render function, holds tax statements). Year-end receipts for the
+# whole ledger are rendered over a process pool and streamed into a ZIP.
+# fpdf is imported on first render so importing this module stays cheap.
+
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_WINDOW = 256
+# Hex digits of the donor hash in file names (64 bits).
+FILENAME_HASH_CHARS = 16
+
+
+def _latin1(text):
+    # The core PDF fonts only cover latin-1.
+    return str(text).encode("latin-1", "replace").decode("latin-1")
+
+
+def content_key(*parts):
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def safe_filename(donor):
+    # Readable, filesystem-safe name for a donor's files. Replacing characters
+    # can make two donors look alike (a+b@x.org, a_b@x.org), so a hash of the
+    # exact address is appended to keep every donor's name distinct.
+    readable = "".join(c if c.isalnum() or c in "._-" else "_" for c in donor)
+    return f"{readable}_{hashlib.sha256(donor.encode('utf-8')).hexdigest()[:FILENAME_HASH_CHARS]}"
+
+
+def render_receipt(donation, user_name):
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=16)
+    pdf.cell(0, 12, "Donation Receipt", ln=True, align="C")
+    pdf.set_font("Arial", size=12)
+    pdf.ln(8)
+    pdf.cell(0, 10, f"Date: {donation['date']}", ln=True)
+    pdf.cell(0, 10, _latin1(f"Donor: {user_name}"), ln=True)
+    pdf.cell(0, 10, f"Amount: ${donation['amount']:,}", ln=True)
+    pdf.cell(0, 10, _latin1(f"Organizations: {', '.join(donation['organizations'])}"), ln=True)
+    pdf.cell(0, 10, f"Donation Type: {donation['frequency']}", ln=True)
+    pdf.ln(8)
+    pdf.multi_cell(0, 10, "Thank you for your generous support of global education equality!\nThis receipt can be used for your records.")
+    return pdf.output(dest='S').encode('latin1')
+
+
+def render_year_end_receipt(donor_name, year, donations):
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=16)
+    pdf.cell(0, 12, f"{year} Year-End Donation Receipt", ln=True, align="C")
+    pdf.set_font("Arial", size=12)
+    pdf.ln(8)
+    pdf.cell(0, 10, _latin1(f"Donor: {donor_name}"), ln=True)
+    pdf.cell(0, 10, f"Total Donated in {year}: ${sum(d['amount'] for d in donations):,}", ln=True)
+    pdf.ln(4)
+    pdf.set_font("Arial", size=10)
+    for donation in donations:
+        line = f"{donation['date']}  ${donation['amount']:,}  {donation['frequency']}  {', '.join(donation['organizations'])}"
+        pdf.multi_cell(0, 7, _latin1(line))
+    pdf.ln(8)
+    pdf.set_font("Arial", size=12)
+    pdf.multi_cell(0, 10, "Thank you for your generous support of global education equality!\nThis receipt can be used for your tax records.")
+    return pdf.output(dest='S').encode('latin1')
+
+
+class ReceiptCache:
+    # LRU cache of rendered PDFs keyed by a content hash of the arguments
+    # passed to `render`.
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, render=render_receipt):
+        self.maxsize = maxsize
+        self.render = render
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+
+    def get(self, *args):
+        key = content_key(*args)
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        pdf_bytes = self.render(*args)
+        with self._lock:
+            self._items[key] = pdf_bytes
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return pdf_bytes
+
+
+def _render_year_end_job(job):
+    donor, donor_name, year, donations = job
+    return [(receipt_filename(donor, year), render_year_end_receipt(donor_name, year, donations))]
+
+
+def _year_end_jobs(ledger, year):
+    rows = ledger.iter_year_donations(year)
+    for donor, donor_rows in groupby(rows, key=lambda row: row["donor"]):
+        donor_rows = list(donor_rows)
+        yield donor, donor_rows[-1]["donor_name"], year, donor_rows
+
+
+def receipt_filename(donor, year):
+    return f"{year}/receipt_{safe_filename(donor)}.pdf"
+
+
+def render_to_zip(out, jobs, render, workers=None, window=DEFAULT_WINDOW):
+    # Run `render` over `jobs` on a process pool and stream the (file name,
+    # PDF bytes) pairs each call returns into the ZIP at `out` (a path or
+    # binary file object), in job order. At most `window` jobs are in flight,
+    # so memory stays bounded however large the ledger is. `render` must be a
+    # module-level function so the pool can pickle it. Returns the number of
+    # files written.
+    count = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool, \
+            zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        in_flight = deque()
+
+        def write_next():
+            nonlocal count
+            for name, pdf_bytes in in_flight.popleft().result():
+                archive.writestr(name, pdf_bytes)
+                count += 1
+
+        for job in jobs:
+            in_flight.append(pool.submit(render, job))
+            if len(in_flight) >= window:
+                write_next()
+        while in_flight:
+            write_next()
+    return count
+
+
+def bulk_year_end_receipts(ledger, year, out, workers=None, window=DEFAULT_WINDOW):
+    # Render one receipt per donor with donations in `year` into the ZIP at
+    # `out`. Returns the number of receipts.
+    return render_to_zip(out, _year_end_jobs(ledger, year), _render_year_end_job, workers, window)
+
+
+def main(argv=None):
+    from ledger import DEFAULT_LEDGER_PATH, DonationLedger
+
+    parser = argparse.ArgumentParser(description="Render year-end donation receipts for every donor into a ZIP.")
+    parser.add_argument("--year", type=int, required=True)
+    parser.add_argument("--out", required=True, help="Path of the ZIP file to write")
+    parser.add_argument("--ledger", default=DEFAULT_LEDGER_PATH)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    ledger = DonationLedger(args.ledger)
+    count = bulk_year_end_receipts(ledger, args.year, args.out, workers=args.workers)
+    print(f"Wrote {count:,} receipts to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import argparse
+import csv
+import sqlite3
+import threading
+from datetime import datetime
+
+from ledger import DEFAULT_LEDGER_PATH, normalize_donor
+
+# Gala seating.
+# Every RSVP is a row in `rsvps`; a seated guest has a table number. Seating
+# respects per-table capacity and per-table limits on specialty meals, which
+# the kitchen plates in small batches. Reservations run inside BEGIN IMMEDIATE
+# transactions, so concurrent RSVPs (from any thread or worker process) can
+# never overfill a table.
+#
+# RSVPs collected outside the app can be imported and seated in one go:
+#   python seating.py --import rsvps.csv
+
+TABLE_COUNT = 50
+TABLE_CAPACITY = 10
+MEAL_OPTIONS = ["Vegetarian", "Vegan", "Chicken", "Fish", "Beef", "Gluten-Free"]
+# meal -> most guests at one table who can be served it
+DEFAULT_MEAL_LIMITS = {"Vegan": 4, "Gluten-Free": 4}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rsvps (
+    guest TEXT PRIMARY KEY,
+    guest_name TEXT NOT NULL,
+    meal TEXT NOT NULL,
+    preferred_table INTEGER,
+    table_number INTEGER,
+    special TEXT NOT NULL DEFAULT '',
+    updated_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_rsvps_table_meal ON rsvps(table_number, meal);
+"""
+
+
+class SeatingError(Exception):
+    def __init__(self, message, suggestions=()):
+        super().__init__(message)
+        self.suggestions = list(suggestions)
+
+
+class SeatingService:
+    def __init__(self, path=DEFAULT_LEDGER_PATH, table_count=TABLE_COUNT,
+                 capacity=TABLE_CAPACITY, meal_limits=None):
+        self.path = path
+        self.table_count = table_count
+        self.capacity = capacity
+        self.meal_limits = DEFAULT_MEAL_LIMITS if meal_limits is None else meal_limits
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    # Occupancy
+
+    def _occupancy(self, conn):
+        # {table: {"seated": n, meal: n, ...}} for every occupied table.
+        occupancy = {}
+        rows = conn.execute(
+            "SELECT table_number, meal, COUNT(*) FROM rsvps "
+            "WHERE table_number IS NOT NULL GROUP BY table_number, meal"
+        )
+        for table, meal, count in rows:
+            counts = occupancy.setdefault(table, {"seated": 0})
+            counts[meal] = count
+            counts["seated"] += count
+        return occupancy
+
+    def _fits(self, counts, meal):
+        if counts["seated"] >= self.capacity:
+            return False
+        limit = self.meal_limits.get(meal)
+        return limit is None or counts.get(meal, 0) < limit
+
+    def _nearest_tables(self, occupancy, meal, preferred, count=None):
+        # Tables that can take one more `meal` guest, nearest to `preferred` first.
+        empty = {"seated": 0}
+        found = []
+        for distance in range(self.table_count):
+            for table in (preferred - distance, preferred + distance) if distance else (preferred,):
+                if 1 <= table <= self.table_count and self._fits(occupancy.get(table, empty), meal):
+                    found.append(table)
+                    if count is not None and len(found) >= count:
+                        return found
+        return found
+
+    def seats_left(self):
+        with self._lock:
+            occupancy = self._occupancy(self._conn)
+        return {
+            table: self.capacity - occupancy.get(table, {"seated": 0})["seated"]
+            for table in range(1, self.table_count + 1)
+        }
+
+    # Reservations
+
+    def get(self, guest):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT guest_name, meal, preferred_table, table_number, special FROM rsvps WHERE guest = ?",
+                (normalize_donor(guest),),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"name": row[0], "meal": row[1], "preferred": row[2], "table": row[3], "special": row[4]}
+
+    def reserve(self, guest, guest_name, meal, table, special=""):
+        # Seat `guest` at `table` or raise SeatingError listing the nearest
+        # tables that could take them instead.
+        guest = normalize_donor(guest)
+        if not 1 <= table <= self.table_count:
+            raise SeatingError(f"Table {table} does not exist.")
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # A guest changing tables frees their old seat first.
+                conn.execute("UPDATE rsvps SET table_number = NULL WHERE guest = ?", (guest,))
+                occupancy = self._occupancy(conn)
+                counts = occupancy.get(table, {"seated": 0})
+                if not self._fits(counts, meal):
+                    if counts["seated"] >= self.capacity:
+                        reason = f"Table {table} is full."
+                    else:
+                        reason = f"Table {table} already has the most {meal} meals the kitchen can plate for one table."
+                    raise SeatingError(reason, self._nearest_tables(occupancy, meal, table, count=3))
+                conn.execute(
+                    "INSERT INTO rsvps (guest, guest_name, meal, preferred_table, table_number, special, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (guest) DO UPDATE SET guest_name = excluded.guest_name, meal = excluded.meal, "
+                    "preferred_table = excluded.preferred_table, table_number = excluded.table_number, "
+                    "special = excluded.special, updated_at = excluded.updated_at",
+                    (guest, guest_name, meal, table, table, special, _now()),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return {"name": guest_name, "meal": meal, "preferred": table, "table": table, "special": special}
+
+    def request_many(self, requests):
+        # Register RSVPs without seating them; auto_assign() places them later.
+        # Each request is a dict with guest, guest_name, meal, preferred_table
+        # and optionally special. Existing seats are kept.
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT INTO rsvps (guest, guest_name, meal, preferred_table, special, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (guest) DO UPDATE SET guest_name = excluded.guest_name, meal = excluded.meal, "
+                    "preferred_table = excluded.preferred_table, special = excluded.special, "
+                    "updated_at = excluded.updated_at",
+                    [
+                        (normalize_donor(r["guest"]), r["guest_name"], r["meal"], r.get("preferred_table"),
+                         r.get("special", ""), _now())
+                        for r in requests
+                    ],
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def auto_assign(self):
+        # Seat every unseated RSVP, in the order they were received, at their
+        # preferred table or the nearest one with room for their meal. Runs as
+        # a single transaction; returns (seated, unseated) guest lists.
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                occupancy = self._occupancy(conn)
+                pending = conn.execute(
+                    "SELECT guest, meal, preferred_table FROM rsvps "
+                    "WHERE table_number IS NULL ORDER BY updated_at, rowid"
+                ).fetchall()
+                seated, unseated = [], []
+                for guest, meal, preferred in pending:
+                    tables = self._nearest_tables(occupancy, meal, preferred or 1, count=1)
+                    if not tables:
+                        unseated.append(guest)
+                        continue
+                    table = tables[0]
+                    counts = occupancy.setdefault(table, {"seated": 0})
+                    counts["seated"] += 1
+                    counts[meal] = counts.get(meal, 0) + 1
+                    seated.append((table, guest))
+                conn.executemany("UPDATE rsvps SET table_number = ? WHERE guest = ?", seated)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return [guest for _, guest in seated], unseated
+
+    def close(self):
+        self._conn.close()
+
+
+def _now():
+    return datetime.now().isoformat(timespec="microseconds")
+
+
+def read_rsvps(path):
+    # RSVP requests from a CSV export with guest, guest_name, meal and
+    # optional preferred_table and special columns.
+    with open(path, newline="", encoding="utf-8") as f:
+        return [
+            {
+                "guest": row["guest"],
+                "guest_name": row["guest_name"],
+                "meal": row["meal"],
+                "preferred_table": int(row["preferred_table"]) if row.get("preferred_table") else None,
+                "special": row.get("special") or "",
+            }
+            for row in csv.DictReader(f)
+        ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seat every unseated RSVP by table preference.")
+    parser.add_argument("--ledger", default=DEFAULT_LEDGER_PATH)
+    parser.add_argument("--import", dest="import_path", metavar="CSV",
+                        help="Register the RSVPs in this CSV (guest, guest_name, meal, preferred_table, special) first")
+    args = parser.parse_args(argv)
+
+    service = SeatingService(args.ledger)
+    if args.import_path:
+        requests = read_rsvps(args.import_path)
+        service.request_many(requests)
+        print(f"Imported {len(requests):,} RSVPs from {args.import_path}")
+    seated, unseated = service.auto_assign()
+    print(f"Seated {len(seated):,} guests; {len(unseated):,} could not be seated")
+    for guest in unseated:
+        print(f"  unseated: {guest}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import argparse
+
+# Donation split engine.
+# A donation is divided across its organizations in proportion to their
+# weights, in whole cents, using largest-remainder rounding: every share is
+# first rounded down, then the leftover cents go one each to the shares with
+# the largest remainders (earlier organizations win ties). Shares therefore
+# always sum exactly to the donated amount.
+#
+# split_cents() handles one donation in pure Python; split_batch() applies the
+# identical integer arithmetic to whole batches with NumPy. numpy and pandas
+# are imported inside the batch functions so the app doesn't pay for them
+# on import.
+#
+# payout_totals() re-splits the whole ledger under a set of weights. The
+# command line compares that with the payouts recorded when each donation
+# was made, e.g. after the catalog weights change:
+#   python splits.py --catalog data/organizations.json
+
+# Weights may be fractional; they are scaled to integers so the arithmetic
+# stays exact.
+WEIGHT_SCALE = 10_000
+DEFAULT_CHUNK_SIZE = 250_000
+
+
+def _scaled(weight):
+    scaled = int(round(weight * WEIGHT_SCALE))
+    if scaled < 0:
+        raise ValueError(f"split weights must be non-negative, got {weight!r}")
+    return scaled
+
+
+def split_cents(amount_cents, weights):
+    weights = [_scaled(w) for w in weights]
+    if not weights:
+        return []
+    total_weight = sum(weights)
+    if total_weight == 0:
+        weights = [1] * len(weights)
+        total_weight = len(weights)
+
+    shares = []
+    remainders = []
+    for i, weight in enumerate(weights):
+        share, remainder = divmod(amount_cents * weight, total_weight)
+        shares.append(share)
+        remainders.append((-remainder, i))
+    leftover = amount_cents - sum(shares)
+    for _, i in sorted(remainders)[:leftover]:
+        shares[i] += 1
+    return shares
+
+
+def split_batch(group, amount_cents, weights):
+    # Vectorised split_cents over many donations at once, in long form:
+    #   group        - donation index (0..n-1) of each (donation, organization)
+    #                  row, non-decreasing, rows in organization order
+    #   amount_cents - amount of each donation, length n
+    #   weights      - weight of each row
+    # Returns the cents allocated to each row.
+    import numpy as np
+
+    group = np.asarray(group, dtype=np.int64)
+    amount_cents = np.asarray(amount_cents, dtype=np.int64)
+    weights = np.rint(np.asarray(weights, dtype=np.float64) * WEIGHT_SCALE).astype(np.int64)
+    if (weights < 0).any():
+        raise ValueError("split weights must be non-negative")
+    if group.size == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    total_weight = np.bincount(group, weights=weights, minlength=amount_cents.size).astype(np.int64)
+    # Donations whose organizations all have zero weight are split evenly.
+    unweighted = total_weight[group] == 0
+    if unweighted.any():
+        weights = np.where(unweighted, 1, weights)
+        total_weight = np.bincount(group, weights=weights, minlength=amount_cents.size).astype(np.int64)
+
+    product = amount_cents[group] * weights
+    shares = product // total_weight[group]
+    remainders = product % total_weight[group]
+    leftover = amount_cents - np.bincount(group, weights=shares, minlength=amount_cents.size).astype(np.int64)
+
+    # Rank rows within each donation by remainder (largest first, ties to the
+    # earlier row) and hand one leftover cent to each of the top `leftover`.
+    rows = np.arange(group.size)
+    order = np.lexsort((rows, -remainders, group))
+    group_start = np.searchsorted(group, group, side="left")
+    rank = np.empty_like(rows)
+    rank[order] = rows - group_start[order]
+    return shares + (rank < leftover[group])
+
+
+def payout_totals(ledger, weights, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Recompute per-organization payouts (in cents) for the whole ledger under
+    # `weights` (organization -> weight), streaming it in chunks of donations.
+    # Organizations missing from `weights` get weight zero.
+    import numpy as np
+    import pandas as pd
+
+    names = list(weights)
+    name_index = pd.Index(names)
+    org_weights = np.array([weights[name] for name in names], dtype=np.float64)
+    totals = np.zeros(len(names), dtype=np.int64)
+    for chunk in ledger.iter_split_chunks(chunk_size):
+        frame = pd.DataFrame.from_records(chunk, columns=["donation_id", "amount", "organization"])
+        group, donation_ids = pd.factorize(frame["donation_id"], sort=True)
+        amounts = frame.groupby(group, sort=True)["amount"].first().to_numpy(dtype=np.int64) * 100
+        # -1 for organizations missing from `weights`.
+        codes = name_index.get_indexer(frame["organization"])
+        row_weights = np.where(codes >= 0, org_weights[codes], 0.0)
+        allocated = split_batch(group, amounts, row_weights)
+        known = codes >= 0
+        totals += np.bincount(codes[known], weights=allocated[known], minlength=len(names)).astype(np.int64)
+    return dict(zip(names, totals.tolist()))
+
+
+def main(argv=None):
+    from catalog import CATALOG_PATH, load_catalog
+    from ledger import DEFAULT_LEDGER_PATH, DonationLedger
+
+    parser = argparse.ArgumentParser(description="Per-organization payouts, recorded and re-split under catalog weights.")
+    parser.add_argument("--ledger", default=DEFAULT_LEDGER_PATH)
+    parser.add_argument("--catalog", default=CATALOG_PATH, help="Catalog whose weights the ledger is re-split under")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Donations per chunk")
+    args = parser.parse_args(argv)
+
+    ledger = DonationLedger(args.ledger)
+    recorded = ledger.org_payouts()
+    catalog = load_catalog(args.catalog)
+    # Organizations no longer in the catalog get weight zero.
+    weights = {org: 0 for org in recorded}
+    weights.update((name, entry["weight"]) for name, entry in catalog.items())
+    resplit = payout_totals(ledger, weights, args.chunk_size)
+
+    print(f"{'organization':<40} {'recorded $':>15} {'re-split $':>15}")
+    for org in sorted(weights):
+        if recorded.get(org, 0) or resplit[org]:
+            print(f"{org:<40} {recorded.get(org, 0) / 100:>15,.2f} {resplit[org] / 100:>15,.2f}")
+    print(f"{'total':<40} {sum(recorded.values()) / 100:>15,.2f} {sum(resplit.values()) / 100:>15,.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import argparse
+import os
+import threading
+from functools import lru_cache
+
+from receipts import _latin1, render_to_zip, safe_filename
+
+# Tax-year donation statements.
+# A statement consolidates one donor's giving for a calendar year: total,
+# number of donations and the amount credited to each organization. The
+# figures come from the donor_year_totals / donor_year_orgs rollups the ledger
+# keeps up to date on every insert, so a statement run never rescans the
+# donations themselves.
+#
+# Every donor gets their own PDF, rendered by one document object per thread:
+# the page header/footer template and the Arial faces are set up once, and the
+# document is reset to that state before each statement instead of building a
+# fresh FPDF. Bulk runs render batches of statements over a process pool and
+# stream the PDFs into a ZIP.
+#
+#   python statements.py --year 2025 --out statements-2025.zip
+
+# Statements per pool job; batching keeps the cost of shipping each job to a
+# worker small next to rendering it.
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_WINDOW = 16
+# Arial styles the statement uses, in the order a page first sets them.
+FONT_STYLES = ("B", "", "I")
+
+_documents = threading.local()
+
+
+@lru_cache(maxsize=None)
+def _statement_document_class():
+    from fpdf import FPDF
+
+    class StatementDocument(FPDF):
+        # Reusable statement document; header() and footer() are the page
+        # template. Fonts are registered up front, then the blank state is
+        # kept so every render() starts from it.
+
+        def __init__(self):
+            super().__init__()
+            self.statement = None
+            self.set_auto_page_break(True, margin=20)
+            unset = dict(self.__dict__)
+            for style in FONT_STYLES:
+                self.set_font("Arial", style)
+            # Keep the registered fonts but leave none selected, as in a new
+            # document.
+            self.__dict__.update(unset)
+            self._blank = dict(self.__dict__)
+
+        def _reset(self, statement):
+            # Back to the blank document; the per-document tables are copied
+            # because rendering fills them in.
+            state = {key: value.copy() if isinstance(value, dict) else value for key, value in self._blank.items()}
+            state["fonts"] = {key: dict(font) for key, font in self._blank["fonts"].items()}
+            self.__dict__.update(state)
+            self.statement = statement
+
+        def header(self):
+            self.set_font("Arial", "B", 11)
+            self.cell(0, 8, f"Global Education Inequality Ball - {self.statement['year']} Donation Statement", ln=True, align="C")
+            self.line(10, 19, 200, 19)
+            self.ln(6)
+
+        def footer(self):
+            self.set_y(-15)
+            self.set_font("Arial", "I", 8)
+            self.cell(0, 10, _latin1(f"{self.statement['donor']} - page {self.page_no()}"), align="C")
+
+        def render(self, statement):
+            self._reset(statement)
+            self.add_page()
+            self.set_font("Arial", size=12)
+            self.cell(0, 8, _latin1(f"Donor: {statement['donor_name']}"), ln=True)
+            self.cell(0, 8, _latin1(f"Email: {statement['donor']}"), ln=True)
+            self.cell(0, 8, f"Tax year: {statement['year']}", ln=True)
+            self.ln(4)
+            self.set_font("Arial", "B", 12)
+            self.cell(0, 8, f"Total contributed: ${statement['total']:,}", ln=True)
+            self.set_font("Arial", size=12)
+            self.cell(0, 8, f"Number of donations: {statement['donation_count']:,}", ln=True)
+            self.ln(4)
+            self.set_font("Arial", "B", 10)
+            self.cell(140, 7, "Organization", border="B")
+            self.cell(0, 7, "Amount", border="B", ln=True, align="R")
+            self.set_font("Arial", size=10)
+            for organization, cents in statement["organizations"]:
+                self.cell(140, 7, _latin1(organization))
+                self.cell(0, 7, f"${cents / 100:,.2f}", ln=True, align="R")
+            self.ln(8)
+            self.set_font("Arial", size=10)
+            self.multi_cell(0, 6, "Thank you for your generous support of global education equality!\n"
+                                  "This statement summarizes your contributions for the year and can be used for your tax records.")
+            return self.output(dest='S').encode('latin1')
+
+    return StatementDocument
+
+
+def _statement_document():
+    document = getattr(_documents, "document", None)
+    if document is None:
+        document = _documents.document = _statement_document_class()()
+    return document
+
+
+def render_statement(statement):
+    # A single donor's statement as PDF bytes.
+    return _statement_document().render(statement)
+
+
+def statement_filename(donor, year):
+    return f"{year}/statement_{safe_filename(donor)}.pdf"
+
+
+def _render_batch(statements):
+    return [
+        (statement_filename(statement["donor"], statement["year"]), render_statement(statement))
+        for statement in statements
+    ]
+
+
+def _batches(ledger, year, batch_size):
+    batch = []
+    for statement in ledger.iter_year_statements(year):
+        batch.append(statement)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def bulk_statements(ledger, year, out, batch_size=DEFAULT_BATCH_SIZE, workers=None, window=DEFAULT_WINDOW):
+    # Render every donor's `year` statement into the ZIP at `out` (a path or
+    # binary file object), one PDF per donor. At most `window` batches are in
+    # flight. Returns the number of statements.
+    return render_to_zip(out, _batches(ledger, year, batch_size), _render_batch, workers, window)
+
+
+def main(argv=None):
+    from ledger import DEFAULT_LEDGER_PATH, DonationLedger
+
+    parser = argparse.ArgumentParser(description="Render tax-year donation statements for every donor into a ZIP.")
+    parser.add_argument("--year", type=int, required=True)
+    parser.add_argument("--out", required=True, help="Path of the ZIP file to write")
+    parser.add_argument("--ledger", default=DEFAULT_LEDGER_PATH)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Statements per worker job")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    ledger = DonationLedger(args.ledger)
+    count = bulk_statements(ledger, args.year, args.out, args.batch_size, args.workers)
+    print(f"Wrote {count:,} statements to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
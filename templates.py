@@ -0,0 +1,138 @@
+import os
+from functools import lru_cache
+from html import escape
+from string import Template
+
+# Page fragments for donate.py.
+# Static fragments are plain constants built once at import; dynamic cards are
+# precompiled string.Template objects that only have values substituted (and
+# HTML-escaped) per rerun. The theme CSS lives in static/donate.css and is
+# referenced with a <link> tag, so reruns send a few bytes instead of the
+# whole stylesheet.
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+STYLESHEET_URL = "app/static/donate.css"
+
+
+@lru_cache(maxsize=None)
+def _inline_stylesheet():
+    with open(os.path.join(STATIC_DIR, "donate.css"), encoding="utf-8") as f:
+        return f"<style>\n{f.read()}</style>"
+
+
+def stylesheet_tag(static_serving):
+    # Without server.enableStaticServing (e.g. launched from another working
+    # directory, so .streamlit/config.toml isn't picked up) fall back to
+    # inlining the stylesheet.
+    if static_serving:
+        return f'<link rel="stylesheet" href="{STYLESHEET_URL}">'
+    return _inline_stylesheet()
+
+
+HEADER_HTML = """
+<h1 class="main-header">🎓 Global Education Inequality Ball</h1>
+<p class="subtitle">A Biannual Gala for Global Education Equality</p>
+<hr class="section-divider">
+"""
+
+SECTION_DIVIDER_HTML = '<hr class="section-divider">'
+
+EVENT_INTRO_MD = """
+**Next Event**: March 15, 2025 | New York City
+
+The Global Education Inequality Ball brings together influential leaders, philanthropists,
+and advocates to address the crisis of education access affecting 250 million children worldwide.
+
+This exclusive biannual gala focuses on:
+- **Gender Equality**: Supporting the 122 million girls without access to education
+- **Conflict Zones**: Rebuilding education systems in war-torn regions
+- **Digital Divide**: Providing internet access and technology
+- **Teacher Training**: Supporting educators in underserved communities
+"""
+
+IMPACT_GOALS_HTML = """
+<div class="stats-card">
+    <h3>🎯 Impact Goals</h3>
+    <ul>
+        <li><strong>250M</strong> children out of school</li>
+        <li><strong>122M</strong> girls denied education</li>
+        <li><strong>$5B</strong> funding gap annually</li>
+        <li><strong>17</strong> countries in crisis</li>
+    </ul>
+</div>
+"""
+
+EVENT_HIGHLIGHTS_MD = """
+- **Keynote**: Malala Yousafzai
+- **Performance**: Global Youth Orchestra
+- **Auction**: Rare books & educational experiences
+- **Awards**: Global Education Champions
+- **Networking**: 500+ philanthropists & leaders
+"""
+
+FOOTER_HTML = """
+<div style='text-align: center; color: #666;'>
+    <p>🌍 <strong>Global Education Inequality Ball</strong> | Together, we can ensure every child has access to quality education</p>
+    <p>Contact: info@globaleducationball.org | +1 (555) 123-EDUCATION</p>
+</div>
+"""
+
+_SUCCESS_CARD = Template("""
+<div class="success-message">
+    <h3>🎉 Donation Successful!</h3>
+    <p><strong>$$${amount}</strong> donated to support global education equality</p>
+    <p>Your exclusive gala ticket has been secured!</p>
+</div>
+""")
+
+_TICKET_CARD = Template("""
+<div class="donation-card">
+    <h3>🌟 VIP Gala Access Confirmed</h3>
+    <p><strong>Event</strong>: Global Education Inequality Ball 2025</p>
+    <p><strong>Date</strong>: March 15, 2025</p>
+    <p><strong>Venue</strong>: The Plaza Hotel, New York</p>
+    <p><strong>Dress Code</strong>: Black-tie with educational theme elements</p>
+    <p><strong>Your Contribution</strong>: $$${contribution}</p>
+</div>
+""")
+
+_RSVP_CARD = Template("""
+<div class="donation-card">
+    <h4>✅ RSVP Confirmed</h4>
+    <ul>
+        <li><strong>Meal:</strong> ${meal}</li>
+        <li><strong>Table:</strong> ${table}</li>
+        <li><strong>Special Requests:</strong> ${special}</li>
+    </ul>
+</div>
+""")
+
+
+def success_card(amount):
+    return _SUCCESS_CARD.substitute(amount=f"{amount:,}")
+
+
+def ticket_card(contribution):
+    return _TICKET_CARD.substitute(contribution=f"{contribution:,}")
+
+
+def rsvp_card(rsvp):
+    return _RSVP_CARD.substitute(
+        meal=escape(rsvp["meal"]),
+        table=escape(str(rsvp["table"])),
+        special=escape(rsvp["special"]) if rsvp["special"] else "None",
+    )
+
+
+_SESSION_COOKIE_SCRIPT = Template("""
+<script>
+const secure = window.parent.location.protocol === "https:" ? "; Secure" : "";
+window.parent.document.cookie = "${name}=${value}; Max-Age=${max_age}; Path=/; SameSite=Strict" + secure;
+</script>
+""")
+
+
+def session_cookie_script(name, value, max_age):
+    # Sets (or, with max_age 0, clears) the session cookie from an empty
+    # st.iframe; the frame shares the app's origin.
+    return _SESSION_COOKIE_SCRIPT.substitute(name=name, value=value, max_age=int(max_age))
@@ -0,0 +1,75 @@
+import sqlite3
+
+import pytest
+
+from aggregates import AggregateCache
+from events import DonationFeed
+from ledger import DonationLedger
+from leaderboard import Leaderboard
+
+
+def donation(donor, amount):
+    return {
+        "donor": donor, "donor_name": donor.split("@")[0], "date": "2025-03-01",
+        "amount": amount, "frequency": "One-time", "organizations": ["Malala Fund"],
+    }
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = DonationLedger(str(tmp_path / "donations.db"))
+    ledger.add(donation("a@x", 100))
+    yield ledger
+    ledger.close()
+
+
+@pytest.fixture
+def feed(ledger):
+    # Polled by hand; the background thread never gets to run.
+    feed = DonationFeed(ledger, poll_interval=3600)
+    yield feed
+    feed.close()
+
+
+def test_batch_published_before_subscribing_is_caught_up(ledger, feed):
+    board = Leaderboard.from_ledger(ledger)
+    aggregates = AggregateCache(ledger)
+    assert aggregates.donor("b@x")["total"] == 0
+    # Another worker records a donation while this process is still starting
+    # up; the feed publishes it before anyone has subscribed.
+    ledger.add(donation("b@x", 9000))
+    assert feed.poll() == 1
+    feed.subscribe(board.apply)
+    feed.subscribe(aggregates.apply)
+    ledger.add(donation("c@x", 10))
+    assert feed.poll() == 1
+    assert [entry["donor"] for entry in board.top()] == ["b@x", "a@x", "c@x"]
+    assert board.watermark == ledger.last_id()
+    assert aggregates.donor("b@x")["total"] == 9000
+
+
+def test_failing_poll_and_subscriber_do_not_lose_donations(ledger, feed, monkeypatch):
+    board = Leaderboard.from_ledger(ledger)
+    seen = []
+
+    def broken(batch):
+        raise RuntimeError("subscriber bug")
+
+    feed.subscribe(broken)
+    feed.subscribe(board.apply)
+    feed.subscribe(seen.extend)
+    ledger.add(donation("b@x", 500))
+
+    def locked(after_id, limit=1000):
+        raise sqlite3.OperationalError("database is locked")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(ledger, "donations_after", locked)
+        with pytest.raises(sqlite3.OperationalError):
+            feed.poll()
+    assert feed.snapshot()["version"] == 0
+
+    assert feed.poll() == 1
+    assert [d["donor"] for d in seen] == ["b@x"]
+    assert board.total_for("b@x") == 500
+    assert feed.snapshot()["total"] == 600
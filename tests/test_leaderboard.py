@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from leaderboard import Leaderboard, _SkipList
+
+
+def expected_order(totals):
+    return sorted((-total, donor) for donor, total in totals.items())
+
+
+def assert_matches(board, totals):
+    order = expected_order(totals)
+    assert len(board) == len(order)
+    assert [(entry["donor"], entry["total"]) for entry in board.top(25)] == [
+        (donor, -neg_total) for neg_total, donor in order[:25]
+    ]
+    for position, (_, donor) in enumerate(order, 1):
+        assert board.rank(donor) == position
+    assert board.rank("nobody@x") is None
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_loads_and_records_match_sorted_order(seed):
+    rng = random.Random(seed)
+    rows = [(f"d{i}@x", f"Donor {i}", rng.randint(1, 1000)) for i in range(rng.randint(0, 300))]
+    board = Leaderboard()
+    board.load(rows)
+    totals = {donor: total for donor, _, total in rows}
+    assert_matches(board, totals)
+    for step in range(600):
+        # Ties on total are common, so donor order breaks them.
+        donor = f"d{rng.randint(0, 500)}@x"
+        amount = rng.choice([1, 5, 10, rng.randint(1, 500)])
+        assert board.record(donor, "Donor", amount) == totals.get(donor, 0) + amount
+        totals[donor] = totals.get(donor, 0) + amount
+        if step % 50 == 0:
+            assert_matches(board, totals)
+    assert_matches(board, totals)
+
+
+def test_load_adds_to_existing_totals():
+    board = Leaderboard()
+    board.record("a@x", "A", 300)
+    board.load([("a@x", "A", 100), ("b@x", "B", 350)])
+    assert_matches(board, {"a@x": 400, "b@x": 350})
+
+
+def test_skip_list_insert_remove_rank():
+    rng = random.Random(7)
+    skiplist = _SkipList.from_sorted(range(0, 2000, 2))
+    reference = list(range(0, 2000, 2))
+    for _ in range(3000):
+        if reference and rng.random() < 0.5:
+            key = reference.pop(rng.randrange(len(reference)))
+            skiplist.remove(key)
+        else:
+            key = rng.randrange(-100, 2100)
+            if key in reference:
+                continue
+            skiplist.insert(key)
+            reference.append(key)
+            reference.sort()
+    assert len(skiplist) == len(reference)
+    assert skiplist.first(len(reference) + 5) == reference
+    for position, key in enumerate(reference, 1):
+        assert skiplist.rank(key) == position
+    with pytest.raises(KeyError):
+        skiplist.remove(-1000)
@@ -0,0 +1,165 @@
+import multiprocessing
+import sqlite3
+
+import pytest
+
+import ledger as ledger_module
+from ledger import SCHEMA_VERSION, DonationLedger, _statements, _upgrade
+
+# Schema written by the first ledger release (user_version 0).
+V1_SCHEMA = """
+CREATE TABLE donations (
+    id INTEGER PRIMARY KEY,
+    donor TEXT NOT NULL,
+    donor_name TEXT NOT NULL,
+    date TEXT NOT NULL,
+    amount INTEGER NOT NULL CHECK (amount > 0),
+    frequency TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+
+CREATE TABLE donation_orgs (
+    donation_id INTEGER NOT NULL REFERENCES donations(id),
+    position INTEGER NOT NULL,
+    organization TEXT NOT NULL,
+    PRIMARY KEY (donation_id, position)
+) WITHOUT ROWID;
+
+CREATE TABLE donor_totals (
+    donor TEXT PRIMARY KEY,
+    donor_name TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    donation_count INTEGER NOT NULL,
+    max_amount INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TRIGGER donations_rollup AFTER INSERT ON donations
+BEGIN
+    INSERT INTO donor_totals (donor, donor_name, total, donation_count, max_amount)
+    VALUES (NEW.donor, NEW.donor_name, NEW.amount, 1, NEW.amount)
+    ON CONFLICT (donor) DO UPDATE SET
+        donor_name = excluded.donor_name,
+        total = total + excluded.total,
+        donation_count = donation_count + 1,
+        max_amount = max(max_amount, excluded.max_amount);
+END;
+"""
+
+
+def legacy_ledger(path, version=1):
+    # A v1 ledger holding a $6,000 donation split across two organizations
+    # and a $100 one across three, upgraded in place to `version`.
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.executescript(V1_SCHEMA)
+    conn.executemany(
+        "INSERT INTO donations (donor, donor_name, date, amount, frequency, created_at) "
+        "VALUES ('ava@big.org', 'Ava', ?, ?, 'One-time', '2024-03-01T10:00:00')",
+        [("2024-03-01", 6000), ("2024-05-01", 100)],
+    )
+    conn.executemany(
+        "INSERT INTO donation_orgs (donation_id, position, organization) VALUES (?, ?, ?)",
+        [
+            (1, 0, "Malala Fund"), (1, 1, "Room to Read"),
+            (2, 0, "Malala Fund"), (2, 1, "Room to Read"), (2, 2, "Teach For All"),
+        ],
+    )
+    conn.execute("BEGIN")
+    for target in range(2, version + 1):
+        _upgrade(conn, target)
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def _open(path, barrier, errors):
+    barrier.wait()
+    try:
+        DonationLedger(path).close()
+    except Exception as e:
+        errors.put(repr(e))
+
+
+def open_concurrently(path, processes=4):
+    # Opens the ledger from several processes released at the same moment;
+    # returns the errors they raised.
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(processes)
+    errors = context.Queue()
+    workers = [context.Process(target=_open, args=(path, barrier, errors)) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+    return [errors.get() for _ in range(errors.qsize())]
+
+
+def user_version(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_statements_keeps_trigger_bodies_whole():
+    statements = list(_statements(V1_SCHEMA))
+    assert len(statements) == 4
+    assert statements[-1].startswith("CREATE TRIGGER") and statements[-1].endswith("END;")
+
+
+@pytest.mark.parametrize("version", [None, 3])
+def test_concurrent_startup_migrates_once(tmp_path, version):
+    path = str(tmp_path / "donations.db")
+    if version is not None:
+        legacy_ledger(path, version)
+    assert open_concurrently(path) == []
+    assert user_version(path) == SCHEMA_VERSION
+    ledger = DonationLedger(path)
+    assert ledger.counters()["donations"] == (0 if version is None else 2)
+    ledger.close()
+
+
+def test_failed_upgrade_leaves_previous_version(tmp_path, monkeypatch):
+    path = str(tmp_path / "donations.db")
+    legacy_ledger(path, 3)
+    # Migration 4 succeeds, then 5 fails part-way through.
+    monkeypatch.setitem(ledger_module.MIGRATIONS, 5, "CREATE TABLE donor_year_totals (x);\nSELECT no_such_function();")
+    with pytest.raises(sqlite3.OperationalError):
+        DonationLedger(path)
+    assert user_version(path) == 3
+    conn = sqlite3.connect(path)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(donations)")]
+    conn.close()
+    assert "idempotency_key" not in columns
+
+
+def assert_split_backfilled(ledger):
+    # $6,000 / 2 and $100 / 3, exact to the cent.
+    assert ledger.org_summary("Malala Fund")["total_cents"] == 300000 + 3334
+    assert ledger.org_summary("Room to Read")["total_cents"] == 300000 + 3333
+    assert ledger.org_summary("Teach For All")["total_cents"] == 3333
+    assert ledger.year_statement("ava@big.org", 2024)["organizations"] == [
+        ("Malala Fund", 303334), ("Room to Read", 303333), ("Teach For All", 3333),
+    ]
+
+
+def test_v1_upgrade_backfills_organization_amounts(tmp_path):
+    path = str(tmp_path / "donations.db")
+    legacy_ledger(path)
+    ledger = DonationLedger(path)
+    assert user_version(path) == SCHEMA_VERSION
+    assert ledger.counters() == {"donations": 2, "dollars": 6100, "tickets": 1}
+    assert_split_backfilled(ledger)
+    ledger.close()
+
+
+def test_upgrade_repairs_ledgers_migrated_without_backfill(tmp_path):
+    # A v5 ledger upgraded by a release whose v2 step left amount_cents NULL.
+    path = str(tmp_path / "donations.db")
+    legacy_ledger(path, 5)
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("UPDATE donation_orgs SET amount_cents = NULL")
+    conn.execute("UPDATE donor_year_orgs SET amount_cents = 0")
+    conn.close()
+    ledger = DonationLedger(path)
+    assert_split_backfilled(ledger)
+    ledger.close()
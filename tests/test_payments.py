@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+import payments
+from payments import SUCCEEDED, UNRECORDED, UNSETTLED, MockPaymentGateway, PaymentPipeline
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(payments, "RECORD_RETRY_DELAYS", (0.001,))
+
+
+def settle(pipeline, key, timeout=10):
+    deadline = time.monotonic() + timeout
+    while pipeline.status(key)["state"] in UNSETTLED:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+    return pipeline.status(key)
+
+
+def pipeline_recording_with(on_success, **kwargs):
+    return PaymentPipeline(MockPaymentGateway(latency=0.001), on_success=on_success, **kwargs)
+
+
+def test_transient_record_failures_are_retried_once_per_attempt():
+    recorded = []
+
+    def flaky(payment):
+        if len(recorded) < 3:
+            recorded.append(None)
+            raise RuntimeError("database is locked")
+        recorded.append(payment["idempotency_key"])
+
+    pipeline = pipeline_recording_with(flaky)
+    pipeline.submit("k1", {"donor": "a@x", "amount": 5000})
+    status = settle(pipeline, "k1")
+    pipeline.close()
+    assert status["state"] == SUCCEEDED
+    assert status["record_attempts"] == 3
+    assert recorded[3:] == ["k1"]
+
+
+def test_payment_that_cannot_be_recorded_is_kept_unrecorded(caplog):
+    def broken(payment):
+        raise RuntimeError("disk I/O error")
+
+    pipeline = pipeline_recording_with(broken, max_tracked=1)
+    pipeline.submit("k1", {"donor": "a@x", "amount": 5000})
+    status = settle(pipeline, "k1")
+    assert status["state"] == UNRECORDED
+    assert status["record_attempts"] == payments.MAX_RECORD_ATTEMPTS
+    assert status["transaction_id"]
+    assert any(r.levelname == "ERROR" and "k1" in r.getMessage() for r in caplog.records)
+    # Never forgotten to make room for newer payments.
+    pipeline.submit("k2", {"donor": "b@x", "amount": 5000})
+    settle(pipeline, "k2")
+    pipeline.close()
+    assert pipeline.status("k1")["state"] == UNRECORDED
@@ -0,0 +1,33 @@
+import io
+import zipfile
+
+from receipts import receipt_filename, render_to_zip, safe_filename
+from statements import statement_filename
+
+
+def test_donor_file_names_are_distinct():
+    donors = ["a+b@x.org", "a_b@x.org", "a.b@x.org", "a-b@x.org", "a b@x.org", "ab@x.org"]
+    names = [safe_filename(donor) for donor in donors]
+    assert len(set(names)) == len(donors)
+    assert len({receipt_filename(donor, 2025) for donor in donors}) == len(donors)
+    assert len({statement_filename(donor, 2025) for donor in donors}) == len(donors)
+
+
+def test_donor_file_names_are_stable_and_safe():
+    name = safe_filename("Ava Smith+gala@big.org")
+    assert name == safe_filename("Ava Smith+gala@big.org")
+    assert name.startswith("Ava_Smith_gala_big.org_")
+    assert all(c.isalnum() or c in "._-" for c in name)
+    assert statement_filename("a+b@x.org", 2025).startswith("2025/statement_a_b_x.org_")
+
+
+def _render_pair(job):
+    return [(f"{job}/a.pdf", b"a%d" % job), (f"{job}/b.pdf", b"b%d" % job)]
+
+
+def test_render_to_zip_writes_every_file_in_job_order():
+    out = io.BytesIO()
+    assert render_to_zip(out, iter(range(10)), _render_pair, workers=2, window=3) == 20
+    with zipfile.ZipFile(out) as archive:
+        assert archive.namelist() == [name for job in range(10) for name, _ in _render_pair(job)]
+        assert archive.read("7/b.pdf") == b"b7"
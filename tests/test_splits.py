@@ -0,0 +1,94 @@
+import random
+
+import pytest
+
+from splits import payout_totals, split_batch, split_cents
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+
+
+def batch_split(donations):
+    # split_batch over [(amount_cents, weights), ...]; returns per-donation shares.
+    group = [i for i, (_, weights) in enumerate(donations) for _ in weights]
+    amounts = [amount for amount, _ in donations]
+    weights = [w for _, row in donations for w in row]
+    shares = split_batch(group, amounts, weights).tolist()
+    result = []
+    for _, row in donations:
+        result.append(shares[:len(row)])
+        shares = shares[len(row):]
+    return result
+
+
+def test_split_cents_breaks_ties_toward_earlier_organizations():
+    assert split_cents(100, [1, 1, 1]) == [34, 33, 33]
+    assert split_cents(200, [1, 1, 1]) == [67, 67, 66]
+    assert split_cents(1, [1, 1]) == [1, 0]
+
+
+def test_zero_weights_split_evenly():
+    assert split_cents(1000, [0, 0, 0]) == [334, 333, 333]
+    assert batch_split([(1000, [0, 0, 0]), (10, [0, 5])]) == [[334, 333, 333], [0, 10]]
+
+
+def test_fractional_weights():
+    assert split_cents(10000, [0.5, 0.25, 0.25]) == [5000, 2500, 2500]
+    assert split_cents(100, [1 / 3, 1 / 3, 1 / 3]) == [34, 33, 33]
+    assert batch_split([(100, [1 / 3, 1 / 3, 1 / 3]), (999, [0.1, 0.9])]) == [[34, 33, 33], [100, 899]]
+
+
+def test_negative_weights_are_rejected():
+    with pytest.raises(ValueError):
+        split_cents(100, [1, -1])
+    with pytest.raises(ValueError):
+        split_batch([0, 0], [100], [1, -1])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_batch_matches_split_cents_and_sums_exactly(seed):
+    rng = random.Random(seed)
+    weight_choices = [0, 0.5, 1, 1, 2, 3, 1 / 3, 0.125, 7.25]
+    donations = [
+        (rng.randint(1, 10_000_000), [rng.choice(weight_choices) for _ in range(rng.randint(1, 6))])
+        for _ in range(2000)
+    ]
+    shares = batch_split(donations)
+    for (amount, weights), batch in zip(donations, shares):
+        assert batch == split_cents(amount, weights)
+        assert sum(batch) == amount
+
+
+def test_empty_batch():
+    assert split_batch([], [], []).tolist() == []
+
+
+def test_payout_totals_reconcile_with_recorded_payouts(tmp_path):
+    from ledger import DonationLedger
+
+    rng = random.Random(3)
+    weights = {"Malala Fund": 2, "Room to Read": 1, "Teach For All": 0.5, "UNICEF Education": 1 / 3}
+    ledger = DonationLedger(str(tmp_path / "donations.db"))
+    records = []
+    for i in range(1000):
+        organizations = rng.sample(list(weights), rng.randint(1, 4))
+        amount = rng.randint(1, 9999)
+        records.append({
+            "donor": f"d{i % 50}@x", "donor_name": "D", "date": "2025-03-01", "amount": amount,
+            "frequency": "One-time", "organizations": organizations,
+            "allocations": split_cents(amount * 100, [weights[org] for org in organizations]),
+        })
+    ledger.append_many(records)
+
+    recorded = ledger.org_payouts()
+    # Small chunks, so the totals are summed across many chunk boundaries.
+    assert payout_totals(ledger, weights, chunk_size=7) == recorded
+    assert payout_totals(ledger, weights) == recorded
+    assert sum(recorded.values()) == sum(record["amount"] for record in records) * 100
+    # Organizations outside `weights` get nothing; their share goes to the rest.
+    resplit = payout_totals(ledger, {org: w for org, w in weights.items() if org != "Teach For All"})
+    assert "Teach For All" not in resplit
+    assert sum(resplit.values()) == sum(
+        record["amount"] for record in records if record["organizations"] != ["Teach For All"]
+    ) * 100
+    ledger.close()
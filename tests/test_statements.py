@@ -0,0 +1,31 @@
+import re
+
+import pytest
+
+pytest.importorskip("fpdf")
+
+from statements import render_statement
+
+
+def statement(donor, organizations):
+    return {
+        "year": 2025, "donor": donor, "donor_name": donor.split("@")[0].title(),
+        "total": sum(cents for _, cents in organizations) // 100, "donation_count": len(organizations),
+        "organizations": organizations,
+    }
+
+
+def pdf_body(pdf_bytes):
+    # The PDF minus its creation timestamp.
+    return re.sub(rb"/CreationDate \(D:\d+\)", b"", pdf_bytes)
+
+
+def test_reused_document_renders_each_statement_afresh():
+    # Long enough to break onto a second page.
+    long = statement("ava@big.org", [(f"Organization {i}", 10000 + i) for i in range(60)])
+    short = statement("ben@small.org", [("Malala Fund", 2500)])
+    first = pdf_body(render_statement(long))
+    assert b"/Count 2" in first
+    assert pdf_body(render_statement(short)) != first
+    assert pdf_body(render_statement(long)) == first
+    assert b"/Count 1" in pdf_body(render_statement(short))